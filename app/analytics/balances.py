@@ -0,0 +1,206 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.analytics.functions import as_date, period_start, upsert
+from app.categories.cache import category_cache
+from app.database import Category, DailyCategoryTotal, MonthlyBalance
+from app.metrics import fetched
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def signed_total():
+    # Доходы увеличивают остаток, расходы уменьшают
+    return case(
+        (Category.category_type == "income", DailyCategoryTotal.total_minor),
+        else_=-DailyCategoryTotal.total_minor,
+    )
+
+
+def signed_totals(wallet_id: int, currency: str):
+    return (
+        select(func.coalesce(func.sum(signed_total()), 0))
+        .join(Category, Category.id == DailyCategoryTotal.category_id)
+        .where(DailyCategoryTotal.wallet_id == wallet_id, DailyCategoryTotal.currency == currency)
+    )
+
+
+async def signed_amount(session: AsyncSession, wallet_id: int, category_id: int, amount_minor: int) -> int:
+    category = await category_cache.get(wallet_id, category_id, session)
+    if category is None:
+        # Категорию удалили, пока операция шла к записи
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Категория не найдена")
+    category_type = getattr(category.category_type, "value", category.category_type)
+    return amount_minor if category_type == "income" else -amount_minor
+
+
+async def lock_balances(session: AsyncSession, wallet_id: int, currency: str):
+    # PostgreSQL, READ COMMITTED: новая строка месяца берёт остаток предыдущего из уже
+    # закоммиченного, и параллельная дельта в предыдущий месяц в неё не попала бы.
+    # Писатели одного (кошелька, валюты) идут по очереди до конца транзакции.
+    # В SQLite запись и так одна на базу
+    if session.get_bind().dialect.name == "postgresql":
+        await session.execute(select(func.pg_advisory_xact_lock(wallet_id, func.hashtext(currency))))
+
+
+async def apply_balance_delta(
+    session: AsyncSession,
+    wallet_id: int,
+    currency: str,
+    day: date,
+    delta: int,
+):
+    # Вызывается в той же транзакции, что и изменение операции.
+    # Месяц без строки получает остаток предыдущего, затем дельта
+    # ложится в движение этого месяца и в остатки всех месяцев с него
+    if not delta:
+        return
+    await lock_balances(session, wallet_id, currency)
+    month = month_start(day)
+    same_wallet = and_(MonthlyBalance.wallet_id == wallet_id, MonthlyBalance.currency == currency)
+
+    previous = (
+        select(MonthlyBalance.closing_minor)
+        .where(same_wallet, MonthlyBalance.month < month)
+        .order_by(MonthlyBalance.month.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    await session.execute(
+        upsert(session, MonthlyBalance).values(
+            wallet_id=wallet_id, currency=currency, month=month,
+            net_minor=0, closing_minor=func.coalesce(previous, 0),
+        ).on_conflict_do_nothing()
+    )
+    await session.execute(
+        update(MonthlyBalance)
+        .where(same_wallet, MonthlyBalance.month >= month)
+        .values(
+            net_minor=MonthlyBalance.net_minor + case((MonthlyBalance.month == month, delta), else_=0),
+            closing_minor=MonthlyBalance.closing_minor + delta,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_balance_deltas(session: AsyncSession, deltas: dict[tuple[int, str, date], int]):
+    # Ключ - (кошелёк, валюта, первый день месяца); по порядку месяцев,
+    # чтобы новая строка месяца видела уже обновлённый остаток предыдущего
+    for (wallet_id, currency, month), delta in sorted(deltas.items()):
+        await apply_balance_delta(session, wallet_id, currency, month, delta)
+
+
+async def expected_balances(session: AsyncSession, wallet_id: Optional[int] = None) -> dict:
+    # Контрольные точки, посчитанные заново из дневного агрегата
+    month = period_start(DailyCategoryTotal.day, "month").label("month")
+    query = (
+        select(DailyCategoryTotal.wallet_id, DailyCategoryTotal.currency, month, func.sum(signed_total()))
+        .join(Category, Category.id == DailyCategoryTotal.category_id)
+        .group_by(DailyCategoryTotal.wallet_id, DailyCategoryTotal.currency, month)
+        .order_by(DailyCategoryTotal.wallet_id, DailyCategoryTotal.currency, month)
+    )
+    if wallet_id is not None:
+        query = query.where(DailyCategoryTotal.wallet_id == wallet_id)
+
+    balances = {}
+    closing = defaultdict(int)
+    for row_wallet_id, currency, row_month, net in await session.execute(query):
+        row_month = as_date(row_month)
+        closing[row_wallet_id, currency] += net
+        balances[row_wallet_id, currency, row_month] = (net, closing[row_wallet_id, currency])
+    return balances
+
+
+async def balance_currencies(session: AsyncSession, wallet_id: int) -> set[str]:
+    currencies = set()
+    for table in (DailyCategoryTotal, MonthlyBalance):
+        currencies.update(await session.scalars(
+            select(table.currency).where(table.wallet_id == wallet_id).distinct()
+        ))
+    return currencies
+
+
+async def rebuild_balances(session: AsyncSession, wallet_id: Optional[int] = None) -> int:
+    # Без коммита: вызывающий решает, в какой транзакции пересобирать
+    if wallet_id is not None:
+        for currency in sorted(await balance_currencies(session, wallet_id)):
+            await lock_balances(session, wallet_id, currency)
+    balances = await expected_balances(session, wallet_id)
+    query = delete(MonthlyBalance)
+    if wallet_id is not None:
+        query = query.where(MonthlyBalance.wallet_id == wallet_id)
+    await session.execute(query)
+    if balances:
+        await session.execute(insert(MonthlyBalance), [
+            {
+                "wallet_id": row_wallet_id, "currency": currency, "month": month,
+                "net_minor": net, "closing_minor": closing,
+            }
+            for (row_wallet_id, currency, month), (net, closing) in balances.items()
+        ])
+    return len(balances)
+
+
+def balance_query(wallet_id: int, currency: str, day: date):
+    # Одна контрольная точка (конец прошлого месяца) плюс хвост текущего месяца
+    month = month_start(day)
+    checkpoint = (
+        select(MonthlyBalance.closing_minor)
+        .where(
+            MonthlyBalance.wallet_id == wallet_id,
+            MonthlyBalance.currency == currency,
+            MonthlyBalance.month < month,
+        )
+        .order_by(MonthlyBalance.month.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    tail = (
+        signed_totals(wallet_id, currency)
+        .where(DailyCategoryTotal.day >= month, DailyCategoryTotal.day <= day)
+        .scalar_subquery()
+    )
+    return select(func.coalesce(checkpoint, 0) + tail)
+
+
+async def balance_on(session: AsyncSession, wallet_id: int, currency: str, day: date) -> int:
+    return await session.scalar(balance_query(wallet_id, currency, day))
+
+
+async def balance_series(
+    session: AsyncSession,
+    wallet_id: int,
+    currency: str,
+    start: date,
+    end: date,
+    unit: str,
+) -> list[tuple[date, int]]:
+    # Остаток на конец каждого периода с движением в [start, end): остаток до начала
+    # диапазона плюс накопленное движение. Периоды без движения не выводятся -
+    # остаток в них тот же, что в предыдущем
+    # С начала времён (date_from не задан) остаток до диапазона - ноль
+    opening = 0
+    if start > date.min:
+        opening = await balance_on(session, wallet_id, currency, start - timedelta(days=1))
+    period = period_start(DailyCategoryTotal.day, unit).label("period")
+    rows = await session.execute(
+        signed_totals(wallet_id, currency)
+        .add_columns(period)
+        .where(DailyCategoryTotal.day >= start, DailyCategoryTotal.day < end)
+        .group_by(period)
+        .order_by(period)
+    )
+
+    series = []
+    balance = opening
+    for net, row_period in fetched(rows.all()):
+        balance += net
+        series.append((row_period, balance))
+    return series
@@ -0,0 +1,96 @@
+import functools
+import time
+from collections import OrderedDict
+from datetime import date
+from enum import Enum
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.responses import FastJSONResponse
+
+
+def freeze(value):
+    # Параметры запроса -> хешируемая часть ключа
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, BaseModel):
+        return tuple(sorted((name, freeze(item)) for name, item in value.model_dump().items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class AnalyticsCache:
+    # Кэш ответов аналитики: LRU с ограничением размера и TTL.
+    # Запись через репозитории увеличивает generation своего кошелька, и его
+    # старые ответы перестают находиться по ключу; чужие кошельки не задевает.
+    # generation живёт в процессе: записи других воркеров видны через TTL.
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generations: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+
+    def make_key(self, endpoint: str, params: dict) -> tuple:
+        wallet_id = params.get("wallet_id")
+        return (
+            wallet_id,
+            self.generations.get(wallet_id, 0),
+            endpoint,
+            date.today(),
+            tuple(sorted((name, freeze(value)) for name, value in params.items())),
+        )
+
+    def get(self, key: tuple):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: tuple, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, wallet_id: int):
+        self.generations[wallet_id] = self.generations.get(wallet_id, 0) + 1
+        for key in [key for key in self.entries if key[0] == wallet_id]:
+            del self.entries[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0,
+            "size": len(self.entries),
+            "wallets": len(self.generations),
+        }
+
+    def cached(self, endpoint: str):
+        # Декоратор для роутов: сигнатура сохраняется, FastAPI видит те же параметры
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(**kwargs):
+                key = self.make_key(endpoint, kwargs)
+                result = self.get(key)
+                if result is None:
+                    result = await func(**kwargs)
+                    self.set(key, result)
+                # Готовый ответ, а не dict: иначе FastAPI прогонит его через
+                # jsonable_encoder, и Decimal превратится во float
+                return FastJSONResponse(result)
+            return wrapper
+        return decorator
+
+
+analytics_cache = AnalyticsCache(settings.analytics_cache_size, settings.analytics_cache_ttl)
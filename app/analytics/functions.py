@@ -0,0 +1,52 @@
+from datetime import date
+
+from sqlalchemy import Date
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+
+class period_start(FunctionElement):
+    # Начало дня \ недели (с понедельника) \ месяца для даты, на стороне базы
+    type = Date()
+    inherit_cache = True
+    # unit входит в ключ кэша скомпилированных запросов
+    _traverse_internals = FunctionElement._traverse_internals + [
+        ("unit", InternalTraversal.dp_string),
+    ]
+
+    def __init__(self, column, unit: str):
+        self.unit = unit
+        super().__init__(column)
+
+
+def as_date(value) -> date:
+    # SQLite отдаёт period_start строкой, PostgreSQL - датой
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+@compiles(period_start)
+def compile_period_start(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"CAST(date_trunc('{element.unit}', {column}) AS DATE)"
+
+
+@compiles(period_start, "sqlite")
+def compile_period_start_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    if element.unit == "week":
+        return f"date({column}, '-6 days', 'weekday 1')"
+    if element.unit == "month":
+        return f"strftime('%Y-%m-01', {column})"
+    return f"date({column})"
+
+
+def upsert(session: AsyncSession, table):
+    # INSERT ... ON CONFLICT одинаково пишется для SQLite и PostgreSQL.
+    # Диалект - по сессии: файлы кошельков всегда SQLite
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql_insert(table)
+    return sqlite_insert(table)
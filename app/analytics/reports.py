@@ -0,0 +1,174 @@
+from datetime import date, timedelta
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # без numpy отчёты недоступны, суммы по категориям считает база
+    np = None
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.analytics import snapshots
+from app.analytics.balances import month_start
+from app.analytics.functions import as_date, period_start
+from app.database import DailyCategoryTotal, MonthlyBalance
+from app.metrics import fetched
+from app.money import from_minor
+from app.operations.schemas import add_months
+
+
+def available() -> bool:
+    return np is not None
+
+
+def month_range(start: date, end: date) -> list[date]:
+    # Месяцы, пересекающие полуинтервал [start, end)
+    months = []
+    month = month_start(start)
+    while month < end:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+async def first_month(session: AsyncSession, wallet_id: int, currency: str) -> Optional[date]:
+    # Первый месяц с операциями - по месячным остаткам; до него отчёт пустой
+    return await session.scalar(
+        select(func.min(MonthlyBalance.month))
+        .where(MonthlyBalance.wallet_id == wallet_id, MonthlyBalance.currency == currency)
+    )
+
+
+def frame_totals(frame: dict, currency: str, category_ids, first_day: int, last_day: int) -> dict[int, int]:
+    # Суммы по категориям за дни [first_day, last_day] одного снимка, целиком в numpy
+    codes = np.flatnonzero(frame["currencies"] == currency)
+    if not len(codes):
+        return {}
+    mask = (
+        (frame["currency"] == codes[0])
+        & (frame["day"] >= first_day)
+        & (frame["day"] <= last_day)
+        & np.isin(frame["category_id"], category_ids)
+    )
+    ids = frame["category_id"][mask]
+    if not len(ids):
+        return {}
+    # Сортировка по категории и reduceat: точные целые суммы, без float
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    unique, starts = np.unique(ids, return_index=True)
+    sums = np.add.reduceat(frame["amount_minor"][mask][order], starts)
+    return dict(zip(unique.tolist(), sums.tolist()))
+
+
+def merge_ranges(ranges: list[tuple[date, date]]) -> list[tuple[date, date]]:
+    merged = []
+    for first, last in ranges:
+        if merged and merged[-1][1] == first:
+            merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+async def monthly_totals(
+    session: AsyncSession,
+    wallet_id: int,
+    currency: str,
+    category_ids: list[int],
+    start: date,
+    end: date,
+) -> dict[date, dict[int, int]]:
+    # {месяц: {категория: сумма}} за [start, end). Закрытые месяцы со снимком
+    # считаются из снимка, остальные дни (текущий месяц, месяцы без снимка) -
+    # одним запросом к дневному агрегату
+    totals = {}
+    live = []
+    ids = np.asarray(category_ids) if snapshots.enabled() else None
+    for month in month_range(start, end):
+        first, last = max(start, month), min(end, add_months(month, 1))
+        frame = None
+        if ids is not None and snapshots.is_closed(month):
+            frame = await snapshots.load(wallet_id, month)
+        if frame is None:
+            live.append((first, last))
+            continue
+        totals[month] = frame_totals(frame, currency, ids, first.day, (last - timedelta(days=1)).day)
+
+    if live:
+        bucket = period_start(DailyCategoryTotal.day, "month").label("month")
+        rows = await session.execute(
+            select(bucket, DailyCategoryTotal.category_id, func.sum(DailyCategoryTotal.total_minor))
+            .where(
+                DailyCategoryTotal.wallet_id == wallet_id,
+                DailyCategoryTotal.category_id.in_(category_ids),
+                DailyCategoryTotal.currency == currency,
+                or_(*(
+                    and_(DailyCategoryTotal.day >= first, DailyCategoryTotal.day < last)
+                    for first, last in merge_ranges(live)
+                )),
+            )
+            .group_by(bucket, DailyCategoryTotal.category_id)
+        )
+        for month, category_id, total in fetched(rows.all()):
+            totals.setdefault(as_date(month), {})[category_id] = total
+    return totals
+
+
+def build_report(
+    totals: dict[date, dict[int, int]],
+    months: list[date],
+    names: dict[int, str],
+    top: int,
+    currency: str,
+) -> dict:
+    # Матрица месяцы x категории: итоги, доли, топ и изменение к прошлому месяцу
+    ids = sorted(names)
+    columns = {category_id: number for number, category_id in enumerate(ids)}
+    matrix = np.zeros((len(months), len(ids)), dtype=np.int64)
+    for row, month in enumerate(months):
+        for category_id, total in totals.get(month, {}).items():
+            matrix[row, columns[category_id]] = total
+
+    by_category = matrix.sum(axis=0)
+    by_month = matrix.sum(axis=1)
+    total = int(by_category.sum())
+    order = np.argsort(-by_category, kind="stable")
+    order = order[by_category[order] != 0]
+    top_columns = order[:top]
+    deltas = np.diff(matrix, axis=0)
+    month_deltas = np.diff(by_month)
+
+    def money(value) -> object:
+        return from_minor(int(value), currency)
+
+    return {
+        "currency": currency,
+        "total": money(total),
+        "categories": [
+            {
+                "category": names[ids[column]],
+                "total_amount": money(by_category[column]),
+                # Возвраты (отрицательные суммы) могут свести итог к нулю
+                "share": round(int(by_category[column]) / total, 4) if total else None,
+            }
+            for column in order
+        ],
+        "top": [names[ids[column]] for column in top_columns],
+        "months": [
+            {
+                "month": month,
+                "total": money(by_month[row]),
+                "delta": money(month_deltas[row - 1]) if row else None,
+                "categories": {
+                    names[ids[column]]: {
+                        "total_amount": money(matrix[row, column]),
+                        "delta": money(deltas[row - 1, column]) if row else None,
+                    }
+                    for column in top_columns
+                },
+            }
+            for row, month in enumerate(months)
+        ],
+    }
@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.analytics.balances import (
+    apply_balance_delta,
+    apply_balance_deltas,
+    expected_balances,
+    month_start,
+    rebuild_balances,
+    signed_amount,
+)
+from app.analytics.functions import upsert
+from app.analytics.snapshots import mark_stale
+from app.database import (
+    DailyCategoryTotal,
+    MonthlyBalance,
+    Operation,
+    new_session,
+    wallet_session,
+)
+
+
+async def apply_delta(
+    session: AsyncSession,
+    wallet_id: int,
+    day: date,
+    category_id: int,
+    currency: str,
+    amount_minor: int,
+    count: int,
+):
+    # Вызывается в той же транзакции, что и изменение операции
+    await apply_rollup_delta(session, wallet_id, day, category_id, currency, amount_minor, count)
+    mark_stale(session, wallet_id, day)
+    await apply_balance_delta(
+        session, wallet_id, currency, day, await signed_amount(session, wallet_id, category_id, amount_minor)
+    )
+
+
+async def apply_rollup_delta(
+    session: AsyncSession,
+    wallet_id: int,
+    day: date,
+    category_id: int,
+    currency: str,
+    amount_minor: int,
+    count: int,
+):
+    query = upsert(session, DailyCategoryTotal).values(
+        wallet_id=wallet_id, day=day, category_id=category_id, currency=currency,
+        total_minor=amount_minor, count=count,
+    )
+    query = query.on_conflict_do_update(
+        index_elements=[
+            DailyCategoryTotal.wallet_id, DailyCategoryTotal.day,
+            DailyCategoryTotal.category_id, DailyCategoryTotal.currency,
+        ],
+        set_={
+            "total_minor": DailyCategoryTotal.total_minor + query.excluded.total_minor,
+            "count": DailyCategoryTotal.count + query.excluded.count,
+        },
+    )
+    await session.execute(query)
+
+    if count < 0:
+        await session.execute(
+            delete(DailyCategoryTotal).where(
+                DailyCategoryTotal.wallet_id == wallet_id,
+                DailyCategoryTotal.day == day,
+                DailyCategoryTotal.category_id == category_id,
+                DailyCategoryTotal.currency == currency,
+                DailyCategoryTotal.count <= 0,
+            )
+        )
+
+
+async def apply_deltas(session: AsyncSession, rows: list[dict]):
+    # Пачка новых операций: одна дельта на (кошелёк, день, категория, валюта)
+    # и одна дельта остатка на (кошелёк, валюта, месяц)
+    totals = defaultdict(lambda: [0, 0])
+    balances = defaultdict(int)
+    for row in rows:
+        key = (row["wallet_id"], row["created_at"], row["category_id"], row["currency"])
+        totals[key][0] += row["amount_minor"]
+        totals[key][1] += 1
+    for (wallet_id, day, category_id, currency), (amount_minor, count) in totals.items():
+        await apply_rollup_delta(session, wallet_id, day, category_id, currency, amount_minor, count)
+        mark_stale(session, wallet_id, day)
+        balances[wallet_id, currency, month_start(day)] += await signed_amount(
+            session, wallet_id, category_id, amount_minor
+        )
+    await apply_balance_deltas(session, balances)
+
+
+def rollup_session(wallet_id: Optional[int]):
+    # Без кошелька - вся общая база, с кошельком - только его строки (или его файл)
+    return new_session() if wallet_id is None else wallet_session(wallet_id)
+
+
+def scoped(query, column, wallet_id: Optional[int]):
+    return query if wallet_id is None else query.where(column == wallet_id)
+
+
+def raw_totals_query():
+    return select(
+        Operation.wallet_id,
+        Operation.created_at,
+        Operation.category_id,
+        Operation.currency,
+        func.sum(Operation.amount_minor),
+        func.count(Operation.id),
+    ).group_by(Operation.wallet_id, Operation.created_at, Operation.category_id, Operation.currency)
+
+
+async def rebuild(wallet_id: Optional[int] = None) -> int:
+    async with rollup_session(wallet_id) as session:
+        rows = await rebuild_rollup(session, wallet_id)
+        await session.commit()
+        return rows
+
+
+async def rebuild_rollup(session: AsyncSession, wallet_id: Optional[int] = None) -> int:
+    # Без коммита: миграции пересобирают агрегат в своей транзакции
+    await session.execute(
+        scoped(delete(DailyCategoryTotal), DailyCategoryTotal.wallet_id, wallet_id)
+    )
+    await session.execute(
+        insert(DailyCategoryTotal).from_select(
+            ["wallet_id", "day", "category_id", "currency", "total_minor", "count"],
+            scoped(raw_totals_query(), Operation.wallet_id, wallet_id),
+        )
+    )
+    await rebuild_balances(session, wallet_id)
+
+    response = await session.execute(
+        scoped(select(func.count(DailyCategoryTotal.id)), DailyCategoryTotal.wallet_id, wallet_id)
+    )
+    return response.scalar()
+
+
+async def verify(wallet_id: Optional[int] = None) -> list[dict]:
+    # Сверяет агрегат с таблицей операций, возвращает расхождения.
+    # Суммы целые, поэтому сравниваются точно
+    async with rollup_session(wallet_id) as session:
+        raw = {
+            tuple(row[:4]): (row[4], row[5])
+            for row in await session.execute(
+                scoped(raw_totals_query(), Operation.wallet_id, wallet_id)
+            )
+        }
+        rollup = {
+            (row.wallet_id, row.day, row.category_id, row.currency): (row.total_minor, row.count)
+            for row in (await session.execute(
+                scoped(select(DailyCategoryTotal), DailyCategoryTotal.wallet_id, wallet_id)
+            )).scalars()
+        }
+        balances = await expected_balances(session, wallet_id)
+        checkpoints = {
+            (row.wallet_id, row.currency, row.month): (row.net_minor, row.closing_minor)
+            for row in (await session.execute(
+                scoped(select(MonthlyBalance), MonthlyBalance.wallet_id, wallet_id)
+            )).scalars()
+        }
+
+    mismatches = []
+    for key in raw.keys() | rollup.keys():
+        expected = raw.get(key, (0, 0))
+        actual = rollup.get(key, (0, 0))
+        if expected != actual:
+            mismatches.append({
+                "wallet_id": key[0],
+                "day": key[1].isoformat(),
+                "category_id": key[2],
+                "currency": key[3],
+                "expected": {"total_minor": expected[0], "count": expected[1]},
+                "actual": {"total_minor": actual[0], "count": actual[1]},
+            })
+    for key in balances.keys() | checkpoints.keys():
+        # Месяц, операции которого все удалены, остаётся строкой с нулевым движением
+        # и остатком предыдущего месяца
+        expected = balances.get(key) or (0, carried_closing(balances, key))
+        actual = checkpoints.get(key, (0, 0))
+        if expected != actual:
+            mismatches.append({
+                "wallet_id": key[0],
+                "currency": key[1],
+                "month": key[2].isoformat(),
+                "expected": {"net_minor": expected[0], "closing_minor": expected[1]},
+                "actual": {"net_minor": actual[0], "closing_minor": actual[1]},
+            })
+    return mismatches
+
+
+def carried_closing(balances: dict, key: tuple) -> int:
+    wallet_id, currency, month = key
+    earlier = [
+        other for other in balances
+        if other[0] == wallet_id and other[1] == currency and other[2] < month
+    ]
+    return balances[max(earlier)][1] if earlier else 0
+
+
+async def main(command: str, wallet_id: Optional[int]) -> int:
+    # Миграции сами пересобирают агрегат через этот модуль, поэтому импорт здесь
+    from app.migrations import check_schema
+
+    await check_schema()
+    if command == "rebuild":
+        rows = await rebuild(wallet_id)
+        print(f"Агрегат пересобран, строк: {rows}")
+        return 0
+
+    mismatches = await verify(wallet_id)
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"Расхождений: {len(mismatches)}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Дневной агрегат операций по категориям и месячные остатки")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--wallet", type=int, help="только этот кошелёк (в режиме TENANT_DATABASE_DIR - его файл)")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.command, args.wallet)))
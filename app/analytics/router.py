@@ -1,90 +1,284 @@
-from datetime import date, timedelta
-from enum import Enum
+from datetime import date
 from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 
-from sqlalchemy import func, select
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import selectinload
 
+from app.analytics.balances import balance_on, balance_series
+from app.analytics.cache import analytics_cache
+from app.analytics.functions import period_start
+from app.analytics.reports import available, build_report, first_month, month_range, monthly_totals
+from app.analytics.schemas import BatchPeriod, Currency, GroupByEnum
+from app.categories.cache import category_cache
 from app.categories.schemas import CategoryType
-from app.database import Category, Operation, new_session
-from app.operations.schemas import PeriodEnum
+from app.config import settings
+from app.database import Category, DailyCategoryTotal, WalletDep, wallet_session
+from app.metrics import fetched
+from app.money import from_minor
+from app.operations.schemas import PeriodParams
+from app.responses import FastJSONResponse
 
 router = APIRouter(prefix="/api/analytics", tags=["Аналитика"])
 
 
-@router.get("/", description="Выводит статистику по доходам и расходам на период")
-async def get_analitics(period: Optional[PeriodEnum] = None):
-    async with new_session() as session:
+@router.get("/cache/", description="Статистика кэша аналитики: попадания и промахи")
+async def get_analytics_cache_stats():
+    return analytics_cache.stats()
+
+
+@router.get(
+    "/",
+    description="Выводит статистику по доходам и расходам на период",
+    response_class=FastJSONResponse,
+)
+@analytics_cache.cached("summary")
+async def get_analitics(
+    wallet_id: WalletDep,
+    period: Annotated[PeriodParams, Depends()],
+    group_by: Optional[GroupByEnum] = None,
+    currency: Currency = settings.default_currency,
+):
+    start_date, end_date = period.resolve()
+    async with wallet_session(wallet_id, read_only=True) as session:
         try:
-            if period is None:
-                start_date = date.today() - timedelta(days=364)
-            else:
-                start_date = date.today() - timedelta(days=period.value)
-
-            income_query = select(func.sum(Operation.amount)).where(
-                Operation.created_at >= start_date,
-                Operation.category.has(category_type="income"),
+            # Один проход по дневному агрегату: доходы и расходы через условный SUM.
+            # Суммы целые (копейки), в Decimal переводятся только в ответе
+            incomes = func.sum(
+                case((Category.category_type == "income", DailyCategoryTotal.total_minor), else_=0)
             )
-            expense_query = select(func.sum(Operation.amount)).where(
-                Operation.created_at >= start_date,
-                Operation.category.has(category_type="expense"),
+            expenses = func.sum(
+                case((Category.category_type == "expense", DailyCategoryTotal.total_minor), else_=0)
             )
 
-            income_result = await session.execute(income_query)
-            expense_result = await session.execute(expense_query)
+            query = (
+                select(incomes, expenses)
+                .join(Category, Category.id == DailyCategoryTotal.category_id)
+                .where(
+                    DailyCategoryTotal.wallet_id == wallet_id,
+                    DailyCategoryTotal.currency == currency,
+                    DailyCategoryTotal.day >= start_date,
+                    DailyCategoryTotal.day < end_date,
+                )
+            )
+            if group_by is not None:
+                bucket = period_start(DailyCategoryTotal.day, group_by.value).label("period")
+                query = query.add_columns(bucket).group_by(bucket).order_by(bucket)
+
+            response = await session.execute(query)
+            rows = fetched(response.all())
 
-            total_income = income_result.scalar() or 0
-            total_expenses = expense_result.scalar() or 0
+            total_income = sum(row[0] or 0 for row in rows)
+            total_expenses = sum(row[1] or 0 for row in rows)
             cashflow = total_income - total_expenses
 
-            return {
-                "incomes": total_income,
-                "expenses": total_expenses,
-                "cashflow": cashflow,
+            result = {
+                "currency": currency,
+                "incomes": from_minor(total_income, currency),
+                "expenses": from_minor(total_expenses, currency),
+                "cashflow": from_minor(cashflow, currency),
             }
+            if group_by is not None:
+                result["series"] = [
+                    {
+                        "period": row.period,
+                        "incomes": from_minor(row[0], currency),
+                        "expenses": from_minor(row[1], currency),
+                        "cashflow": from_minor((row[0] or 0) - (row[1] or 0), currency),
+                    }
+                    for row in rows
+                ]
+            return result
 
         except Exception as e:
             raise e
 
 
 @router.get(
-    "/categories/", description="Выводит статистику по доходам\расходам на период ПО КАТЕГОРИЯМ"
+    "/categories/",
+    description="Выводит статистику по доходам\расходам на период ПО КАТЕГОРИЯМ",
+    response_class=FastJSONResponse,
 )
+@analytics_cache.cached("by_category")
 async def get_analitics_by_category(
+    wallet_id: WalletDep,
     types: CategoryType,
-    period: Optional[PeriodEnum] = None,
+    period: Annotated[PeriodParams, Depends()],
+    currency: Currency = settings.default_currency,
 ):
-    async with new_session() as session:
+    start_date, end_date = period.resolve()
+    async with wallet_session(wallet_id, read_only=True) as session:
         try:
-            if period is None:
-                start_date = date.today() - timedelta(days=364)
-            else:
-                start_date = date.today() - timedelta(days=period.value)
-
-            subquery = (
-                select(
-                    Operation.category_id,
-                    func.sum(Operation.amount).label("total_amount"),
-                )
-                .where(
-                    Operation.category.has(category_type=types),
-                    Operation.created_at >= start_date,
-                )
-                .group_by(Operation.category_id)
-                .subquery()
-            )
-
+            # Категории нужного типа и их имена берём из кэша, без JOIN
+            categories = {
+                category.id: category.name
+                for category in await category_cache.get_by_type(wallet_id, types)
+            }
 
-            query = select(Category.name, subquery.c.total_amount).join(
-                subquery, Category.id == subquery.c.category_id
+            # Закрытые месяцы - из снимков (если включены), остальное - из дневного агрегата
+            totals = {}
+            months = await monthly_totals(
+                session, wallet_id, currency, list(categories), start_date, end_date
             )
+            for by_category in months.values():
+                for category_id, amount in by_category.items():
+                    totals[category_id] = totals.get(category_id, 0) + amount
 
-            request = await session.execute(query)
-            result = request.all()
-
-            return [{"category": row[0], "total_amount": row[1]} for row in result]
+            return [
+                {"category": categories[category_id], "total_amount": from_minor(totals[category_id], currency)}
+                for category_id in sorted(totals)
+            ]
 
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/report/",
+    description="Отчёт по категориям за период: доли, топ категорий и изменение к прошлому месяцу",
+    response_class=FastJSONResponse,
+)
+@analytics_cache.cached("report")
+async def get_report(
+    wallet_id: WalletDep,
+    types: CategoryType,
+    period: Annotated[PeriodParams, Depends()],
+    top: Annotated[int, Query(ge=1, le=50)] = 5,
+    currency: Currency = settings.default_currency,
+):
+    if not available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Отчёты требуют пакет numpy")
+    start_date, end_date = period.resolve()
+    categories = {
+        category.id: category.name
+        for category in await category_cache.get_by_type(wallet_id, types)
+    }
+    async with wallet_session(wallet_id, read_only=True) as session:
+        # Период без нижней границы (date_from=0001-01-01) - с первого месяца с данными,
+        # а не десятки тысяч пустых строк матрицы
+        start_date = max(start_date, await first_month(session, wallet_id, currency) or end_date)
+        months = month_range(start_date, end_date)
+        totals = await monthly_totals(
+            session, wallet_id, currency, list(categories), start_date, end_date
+        )
+    return build_report(totals, months, categories, top, currency)
+
+
+@router.get(
+    "/batch/",
+    description="Доходы и расходы сразу за несколько периодов одним запросом к базе",
+    response_class=FastJSONResponse,
+)
+@analytics_cache.cached("batch")
+async def get_analitics_batch(
+    wallet_id: WalletDep,
+    periods: Annotated[list[BatchPeriod], Query()] = [
+        BatchPeriod.day, BatchPeriod.week, BatchPeriod.month, BatchPeriod.year,
+    ],
+    types: Annotated[list[CategoryType], Query()] = [
+        CategoryType.income, CategoryType.expense,
+    ],
+    by_category: bool = False,
+    currency: Currency = settings.default_currency,
+):
+    today = date.today()
+    periods = list(dict.fromkeys(periods))
+    starts = [period.start(today) for period in periods]
+    categories = {
+        category.id: category
+        for category_type in dict.fromkeys(types)
+        for category in await category_cache.get_by_type(wallet_id, category_type)
+    }
+
+    # Один проход по агрегату: по колонке условного SUM на каждый период -
+    # сумма и число операций (категория с нулевым итогом всё равно попадает в ответ)
+    query = (
+        select(
+            DailyCategoryTotal.category_id,
+            *(
+                func.sum(case((DailyCategoryTotal.day >= start, DailyCategoryTotal.total_minor), else_=0))
+                for start in starts
+            ),
+            *(
+                func.sum(case((DailyCategoryTotal.day >= start, DailyCategoryTotal.count), else_=0))
+                for start in starts
+            ),
+        )
+        .where(
+            DailyCategoryTotal.wallet_id == wallet_id,
+            DailyCategoryTotal.category_id.in_(categories),
+            DailyCategoryTotal.currency == currency,
+            DailyCategoryTotal.day >= min(starts),
+            DailyCategoryTotal.day <= today,
+        )
+        .group_by(DailyCategoryTotal.category_id)
+    )
+    async with wallet_session(wallet_id, read_only=True) as session:
+        rows = fetched((await session.execute(query)).all())
+
+    result = {}
+    for number, period in enumerate(periods):
+        totals = {category_type.value: 0 for category_type in types}
+        by_type = {category_type.value: [] for category_type in types}
+        for row in rows:
+            category = categories[row[0]]
+            category_type = getattr(category.category_type, "value", category.category_type)
+            amount = row[number + 1] or 0
+            totals[category_type] += amount
+            if row[len(periods) + number + 1]:
+                by_type[category_type].append(
+                    {"category": category.name, "total_amount": from_minor(amount, currency)}
+                )
+
+        if {"income", "expense"} <= totals.keys():
+            totals["cashflow"] = totals["income"] - totals["expense"]
+        totals = {key: from_minor(value, currency) for key, value in totals.items()}
+        if by_category:
+            totals["categories"] = by_type
+        result[period.value] = totals
+    return {"currency": currency, "periods": result}
+
+
+@router.get(
+    "/balance/",
+    description="Остаток кошелька на дату (по умолчанию на сегодня)",
+    response_class=FastJSONResponse,
+)
+@analytics_cache.cached("balance")
+async def get_balance(
+    wallet_id: WalletDep,
+    on: Optional[date] = None,
+    currency: Currency = settings.default_currency,
+):
+    on = on or date.today()
+    # Контрольная точка прошлого месяца плюс хвост текущего: время не зависит от длины истории
+    async with wallet_session(wallet_id, read_only=True) as session:
+        balance = await balance_on(session, wallet_id, currency, on)
+    return {"currency": currency, "on": on, "balance": from_minor(balance, currency)}
+
+
+@router.get(
+    "/balance/series/",
+    description="Остаток на конец каждого дня\\недели\\месяца периода, в котором было движение",
+    response_class=FastJSONResponse,
+)
+@analytics_cache.cached("balance_series")
+async def get_balance_series(
+    wallet_id: WalletDep,
+    period: Annotated[PeriodParams, Depends()],
+    group_by: GroupByEnum = GroupByEnum.month,
+    currency: Currency = settings.default_currency,
+):
+    start_date, end_date = period.resolve()
+    async with wallet_session(wallet_id, read_only=True) as session:
+        series = await balance_series(
+            session, wallet_id, currency, start_date, end_date, group_by.value
+        )
+    return {
+        "currency": currency,
+        "series": [
+            {"period": period_start, "balance": from_minor(balance, currency)}
+            for period_start, balance in series
+        ],
+    }
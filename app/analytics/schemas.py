@@ -0,0 +1,39 @@
+from datetime import date
+from enum import Enum
+from typing import Annotated
+
+from fastapi import Query
+
+from app.money import CURRENCY_PATTERN
+from app.operations.schemas import CalendarPeriod, PeriodEnum, PeriodParams
+
+
+# Аналитика считается в одной валюте, суммы разных валют не складываются
+Currency = Annotated[str, Query(pattern=CURRENCY_PATTERN)]
+
+
+class GroupByEnum(str, Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+class BatchPeriod(str, Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+    year = "year"
+    mtd = "mtd"
+    qtd = "qtd"
+    ytd = "ytd"
+
+    def params(self) -> PeriodParams:
+        if self.value in CalendarPeriod.__members__:
+            return PeriodParams(calendar=CalendarPeriod(self.value))
+        if self == BatchPeriod.year:
+            return PeriodParams()  # Последние DEFAULT_PERIOD_DAYS дней, как у списков
+        return PeriodParams(period=PeriodEnum[self.name.upper()])
+
+    def start(self, today: date) -> date:
+        # Все периоды пакетного запроса заканчиваются сегодня и отличаются только началом
+        return self.params().resolve(today)[0]
@@ -0,0 +1,233 @@
+"""Снимки закрытых месяцев: колонки операций в сжатом .npz, файл на (кошелёк, месяц).
+
+Запуск из корня проекта:
+    python -m app.analytics.snapshots export [--wallet N] [--month 2026-03] [--force]
+Выгружает закрытые месяцы, для которых снимка ещё нет (--force - все заново).
+Нужны numpy и SNAPSHOT_DIR. Отчёты берут закрытые месяцы из снимков,
+текущий месяц и месяцы без снимка - из дневного агрегата.
+"""
+import argparse
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import date
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy - необязательная зависимость: без неё снимки выключены
+    np = None
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.analytics.balances import month_start
+from app.config import settings
+from app.database import DailyCategoryTotal, MonthlyBalance, Operation, new_read_session, tenant_files, wallet_session
+from app.operations.schemas import add_months
+
+EXPORT_CHUNK_SIZE = 50_000
+# Сколько месяцев держать загруженными в памяти процесса
+CACHE_SIZE = 512
+
+frames: OrderedDict[str, tuple[int, dict]] = OrderedDict()
+
+
+def enabled() -> bool:
+    return np is not None and settings.snapshot_dir is not None
+
+
+def snapshot_path(wallet_id: int, month: date) -> str:
+    return os.path.join(settings.snapshot_dir, f"wallet_{wallet_id}", f"{month:%Y-%m}.npz")
+
+
+def is_closed(month: date) -> bool:
+    return month < month_start(date.today())
+
+
+def mark_stale(session: AsyncSession, wallet_id: int, day: date):
+    # Запись задним числом в закрытый месяц: снимок удаляется после коммита,
+    # пока его не выгрузят заново, месяц читается из базы. До коммита удалять
+    # нельзя: параллельная выгрузка успела бы записать старые данные заново
+    if not enabled() or not is_closed(month_start(day)):
+        return
+    session.info.setdefault("stale_snapshots", set()).add(snapshot_path(wallet_id, month_start(day)))
+
+
+def remove_stale(session: Session):
+    for path in session.info.pop("stale_snapshots", ()):
+        frames.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def forget_stale(session: Session):
+    session.info.pop("stale_snapshots", None)
+
+
+event.listen(Session, "after_commit", remove_stale)
+event.listen(Session, "after_rollback", forget_stale)
+
+
+def read_frame(path: str) -> dict:
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+async def load(wallet_id: int, month: date) -> Optional[dict]:
+    # Колонки снимка или None, если его нет. Файл мог смениться
+    # в другом процессе, поэтому кэш сверяется с mtime
+    path = snapshot_path(wallet_id, month)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        frames.pop(path, None)
+        return None
+
+    cached = frames.get(path)
+    if cached is not None and cached[0] == mtime:
+        frames.move_to_end(path)
+        return cached[1]
+
+    # Распаковка .npz - десятки миллисекунд, в потоке, чтобы не держать event loop
+    frame = await asyncio.to_thread(read_frame, path)
+    frames[path] = (mtime, frame)
+    while len(frames) > CACHE_SIZE:
+        frames.popitem(last=False)
+    return frame
+
+
+async def month_rollup(wallet_id: int, month: date) -> list[tuple]:
+    # Строки дневного агрегата за месяц: меняются с любой записью в месяц
+    async with wallet_session(wallet_id, read_only=True) as session:
+        rows = await session.execute(
+            select(
+                DailyCategoryTotal.day, DailyCategoryTotal.category_id, DailyCategoryTotal.currency,
+                DailyCategoryTotal.total_minor, DailyCategoryTotal.count,
+            )
+            .where(
+                DailyCategoryTotal.wallet_id == wallet_id,
+                DailyCategoryTotal.day >= month,
+                DailyCategoryTotal.day < add_months(month, 1),
+            )
+            .order_by(DailyCategoryTotal.day, DailyCategoryTotal.category_id, DailyCategoryTotal.currency)
+        )
+        return [tuple(row) for row in rows]
+
+
+async def export_month(wallet_id: int, month: date) -> Optional[int]:
+    # Строки месяца идут потоком пачками, в памяти - только колонки:
+    # день месяца, категория, код валюты (индекс в currencies) и сумма.
+    # Имена и типы категорий не копируются: они берутся из кэша категорий,
+    # так что переименование категории снимок не портит
+    rollup = await month_rollup(wallet_id, month)
+    days, category_ids, currencies, amounts = [], [], [], []
+    async with wallet_session(wallet_id, read_only=True) as session:
+        result = await session.stream(
+            select(Operation.created_at, Operation.category_id, Operation.currency, Operation.amount_minor)
+            .where(
+                Operation.wallet_id == wallet_id,
+                Operation.created_at >= month,
+                Operation.created_at < add_months(month, 1),
+            )
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            days.append(np.fromiter((row[0].day for row in rows), np.uint8, len(rows)))
+            category_ids.append(np.fromiter((row[1] for row in rows), np.int32, len(rows)))
+            currencies.append(np.array([row[2] for row in rows]))
+            amounts.append(np.fromiter((row[3] for row in rows), np.int64, len(rows)))
+
+    if not days:
+        return 0
+    codes, currency = np.unique(np.concatenate(currencies), return_inverse=True)
+
+    # Запись через временный файл: читатели видят либо старый снимок, либо новый целиком
+    path = snapshot_path(wallet_id, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as file:
+        np.savez_compressed(
+            file,
+            day=np.concatenate(days),
+            category_id=np.concatenate(category_ids),
+            currency=currency.astype(np.uint8),
+            amount_minor=np.concatenate(amounts),
+            currencies=codes,
+        )
+    os.replace(f"{path}.tmp", path)
+
+    # Запись задним числом, закоммиченная во время выгрузки, могла удалить старый
+    # снимок раньше, чем его заменил этот - тогда он устарел: агрегат месяца
+    # сверяется после замены, и при расхождении снимок удаляется
+    if await month_rollup(wallet_id, month) != rollup:
+        frames.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return None
+    return sum(len(chunk) for chunk in days)
+
+
+async def wallet_ids() -> list[int]:
+    if settings.tenant_database_dir is not None:
+        return [wallet_id for wallet_id, _ in tenant_files()]
+    async with new_read_session() as session:
+        return (await session.scalars(
+            select(MonthlyBalance.wallet_id).distinct().order_by(MonthlyBalance.wallet_id)
+        )).all()
+
+
+async def closed_months(wallet_id: int) -> list[date]:
+    # Месяцы с операциями известны по месячным остаткам, без прохода по операциям
+    async with wallet_session(wallet_id, read_only=True) as session:
+        return (await session.scalars(
+            select(MonthlyBalance.month).distinct()
+            .where(MonthlyBalance.wallet_id == wallet_id, MonthlyBalance.month < month_start(date.today()))
+            .order_by(MonthlyBalance.month)
+        )).all()
+
+
+async def export(wallet_id: Optional[int] = None, month: Optional[date] = None, force: bool = False) -> list[str]:
+    done = []
+    for current_wallet_id in [wallet_id] if wallet_id is not None else await wallet_ids():
+        months = [month] if month is not None else await closed_months(current_wallet_id)
+        for current_month in months:
+            if not is_closed(current_month):
+                continue
+            if not force and os.path.exists(snapshot_path(current_wallet_id, current_month)):
+                continue
+            rows = await export_month(current_wallet_id, current_month)
+            name = f"Кошелёк {current_wallet_id}, {current_month:%Y-%m}"
+            if rows is None:
+                done.append(f"{name}: месяц изменился во время выгрузки, снимок не сохранён")
+            else:
+                done.append(f"{name}: операций {rows}")
+    return done
+
+
+async def main(wallet_id: Optional[int], month: Optional[str], force: bool) -> int:
+    if not enabled():
+        print("Снимки выключены: нужны numpy и SNAPSHOT_DIR")
+        return 1
+    # Миграции импортируют агрегат, а он - этот модуль, поэтому импорт здесь
+    from app.migrations import check_schema
+
+    await check_schema()
+    done = await export(wallet_id, date.fromisoformat(f"{month}-01") if month else None, force)
+    for line in done or ["Новых закрытых месяцев нет"]:
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--wallet", type=int)
+    parser.add_argument("--month", help="один месяц, YYYY-MM")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.wallet, args.month, args.force)))
@@ -0,0 +1,149 @@
+import time
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import Category, new_read_session, wallet_session
+from app.metrics import fetched
+
+
+def cache_key(category_type, name: str) -> tuple[str, str]:
+    # category_type бывает и строкой из базы, и CategoryType из запроса
+    return getattr(category_type, "value", category_type), name
+
+
+class CategoryCache:
+    # Категорий мало и меняются они редко: держим их в памяти процесса.
+    # Заполняется при старте (lifespan), обновляется при записи через CategoryRepo.
+    # Категорию мог записать другой воркер: промах проверяется в базе,
+    # а списки перечитываются не чаще раза в CATEGORY_CACHE_TTL секунд (см. refresh).
+    # Всё хранится по кошелькам: id категорий в файлах разных кошельков могут совпадать
+
+    def __init__(self):
+        # Чтение - через .get: запрос к неизвестному кошельку не заводит в кэше запись
+        self.by_id: dict[int, dict[int, Category]] = {}
+        self.by_type_name: dict[int, dict[tuple[str, str], Category]] = {}
+        self.loaded: set[int] = set()
+        self.loaded_all = False
+        # Когда кошелёк (или все разом) последний раз читались из базы, time.monotonic()
+        self.loaded_at: dict[int, float] = {}
+        self.loaded_all_at = 0.0
+
+    async def load(self, wallet_id: Optional[int] = None):
+        # Без кошелька - все кошельки общей базы разом; с кошельком - только он
+        if wallet_id is None:
+            async with new_read_session() as session:
+                categories = fetched((await session.execute(select(Category))).scalars().all())
+            self.by_id.clear()
+            self.by_type_name.clear()
+            self.loaded.clear()
+        else:
+            async with wallet_session(wallet_id, read_only=True) as session:
+                categories = fetched((await session.execute(
+                    select(Category).where(Category.wallet_id == wallet_id)
+                )).scalars().all())
+            self.by_id.pop(wallet_id, None)
+            self.by_type_name.pop(wallet_id, None)
+
+        for category in categories:
+            self.put(category)
+        if wallet_id is None:
+            self.loaded_all = True
+            self.loaded_all_at = time.monotonic()
+            self.loaded_at.clear()
+        else:
+            self.loaded.add(wallet_id)
+            self.loaded_at[wallet_id] = time.monotonic()
+
+    async def ensure_loaded(self, wallet_id: int):
+        # В режиме файлов на кошелёк каждый кошелёк подгружается при первом обращении
+        if wallet_id in self.loaded:
+            return
+        if self.loaded_all and settings.tenant_database_dir is None:
+            return
+        await self.load(wallet_id)
+
+    def put(self, category: Category):
+        by_id = self.by_id.setdefault(category.wallet_id, {})
+        by_type_name = self.by_type_name.setdefault(category.wallet_id, {})
+        old = by_id.get(category.id)
+        if old is not None:
+            by_type_name.pop(cache_key(old.category_type, old.name), None)
+        by_id[category.id] = category
+        by_type_name[cache_key(category.category_type, category.name)] = category
+
+    def remove(self, wallet_id: int, category_id: int):
+        category = self.by_id.get(wallet_id, {}).pop(category_id, None)
+        if category is not None:
+            self.by_type_name.get(wallet_id, {}).pop(cache_key(category.category_type, category.name), None)
+
+    async def refresh(self, wallet_id: int):
+        # Изменения других воркеров (и переименования) видны не позже чем через
+        # CATEGORY_CACHE_TTL секунд: тогда кошелёк перечитывается целиком,
+        # в остальное время списки отдаются из памяти без запросов
+        await self.ensure_loaded(wallet_id)
+        loaded_at = self.loaded_at.get(wallet_id, self.loaded_all_at)
+        if time.monotonic() - loaded_at >= settings.category_cache_ttl:
+            await self.load(wallet_id)
+
+    async def get(
+        self, wallet_id: int, category_id: int, session: Optional[AsyncSession] = None
+    ) -> Optional[Category]:
+        # session - транзакция записи: промах проверяется в ней, а не на реплике
+        await self.ensure_loaded(wallet_id)
+        category = self.by_id.get(wallet_id, {}).get(category_id)
+        if category is not None:
+            return category
+
+        query = select(Category).where(Category.id == category_id, Category.wallet_id == wallet_id)
+        if session is not None:
+            category = (await session.execute(query)).scalar_one_or_none()
+        else:
+            async with wallet_session(wallet_id) as session:
+                category = (await session.execute(query)).scalar_one_or_none()
+        if category is not None:
+            self.put(category)
+        return category
+
+    async def get_many(
+        self, wallet_id: int, category_ids, session: Optional[AsyncSession] = None
+    ) -> dict[int, Category]:
+        # Найденные категории из набора id: промахи - одним запросом, а не по запросу на id
+        await self.ensure_loaded(wallet_id)
+        cached = self.by_id.get(wallet_id, {})
+        found = {category_id: cached[category_id] for category_id in category_ids if category_id in cached}
+        missing = set(category_ids) - found.keys()
+        if not missing:
+            return found
+
+        query = select(Category).where(Category.id.in_(missing), Category.wallet_id == wallet_id)
+        if session is not None:
+            categories = fetched((await session.execute(query)).scalars().all())
+        else:
+            async with wallet_session(wallet_id) as session:
+                categories = fetched((await session.execute(query)).scalars().all())
+        for category in categories:
+            self.put(category)
+            found[category.id] = category
+        return found
+
+    async def get_by_name(self, wallet_id: int, category_type: str, name: str) -> Optional[Category]:
+        await self.ensure_loaded(wallet_id)
+        return self.by_type_name.get(wallet_id, {}).get(cache_key(category_type, name))
+
+    async def get_all(self, wallet_id: int) -> list[Category]:
+        await self.refresh(wallet_id)
+        return list(self.by_id.get(wallet_id, {}).values())
+
+    async def get_by_type(self, wallet_id: int, category_type: str) -> list[Category]:
+        await self.refresh(wallet_id)
+        category_type = getattr(category_type, "value", category_type)
+        return [
+            category for category in self.by_id.get(wallet_id, {}).values()
+            if cache_key(category.category_type, category.name)[0] == category_type
+        ]
+
+
+category_cache = CategoryCache()
@@ -1,90 +1,125 @@
 from typing import Annotated
 
 from fastapi import Depends, HTTPException
-from sqlalchemy import select
+from sqlalchemy import delete, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.analytics.balances import rebuild_balances
+from app.analytics.cache import analytics_cache
+from app.categories.cache import category_cache
 from app.categories.schemas import CreateCategory
-from app.database import Category, new_session
+from app.database import Category
 
 
 
 class CategoryRepo:
 
     @classmethod
-    async def create_one(cls, data: Annotated[CreateCategory, Depends()]):
-        async with new_session() as session:
-
-            new_data = data.model_dump()
-            new_data["name"] = data.name.lower()
-            new_category = Category(**new_data)
-            
-            try:
-                session.add(new_category)
-                await session.commit() 
-                await session.flush()
-                
-                return new_category.id
+    async def create_one(
+        cls, session: AsyncSession, wallet_id: int, data: Annotated[CreateCategory, Depends()]
+    ):
+        new_data = data.model_dump()
+        new_data["name"] = data.name.lower()
+        new_category = Category(**new_data, wallet_id=wallet_id)
+        
+        try:
+            session.add(new_category)
+            await session.commit() 
+            category_cache.put(new_category)
+            analytics_cache.invalidate(wallet_id)
             
-            except IntegrityError:
-                await session.rollback()
-                raise HTTPException(status_code=400, detail=f"Категория с таким именем уже существует")
+            return new_category.id
+        
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(status_code=400, detail=f"Категория с таким именем уже существует")
     
     @classmethod
-    async def get_one(cls, category_id: int):
-        async with new_session() as session:
-            try:
-                query = select(Category).where(Category.id == category_id)
-                response = await session.execute(query)
-                result = response.scalar_one()
-
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Категория с таким id не существует")
-            return result
+    async def get_one(cls, wallet_id: int, category_id: int):
+        try:
+            result = await category_cache.get(wallet_id, int(category_id))
+        except ValueError:
+            result = None
+
+        if result is None:
+            raise HTTPException(status_code=400, detail=f"Категория с таким id не существует")
+        return result
     
     @classmethod
-    async def get_all(cls):
-        async with new_session() as session:
-            query = select(Category)
-            response = await session.execute(query)
-            categories = response.scalars().all()
-            
-            return categories
+    async def get_all(cls, wallet_id: int):
+        return await category_cache.get_all(wallet_id)
+
+    @classmethod
+    async def get_by_type(cls, wallet_id: int, category_type: str):
+        return await category_cache.get_by_type(wallet_id, category_type)
         
     @classmethod
     async def update_one(
         cls,
+        session: AsyncSession,
+        wallet_id: int,
         category_id: int,
         data: Annotated[CreateCategory, Depends()]
     ):
-        async with new_session() as session:
-            try:
-                new_data = data.model_dump()
-                category_instance = await cls.get_one(category_id)
-                category_instance.category_type = new_data["category_type"]
-                category_instance.name = new_data["name"]
-            
-                session.add(category_instance)
-                await session.commit()
-                await session.flush()
+        try:
+            category_id = int(category_id)
+            old = await category_cache.get(wallet_id, category_id)
+            new_data = data.model_dump()
+            # UPDATE ... RETURNING: новая версия строки сразу уходит в кэш
+            response = await session.execute(
+                update(Category)
+                .where(Category.id == category_id, Category.wallet_id == wallet_id)
+                .values(category_type=new_data["category_type"], name=new_data["name"])
+                .returning(Category)
+            )
+            category_instance = response.scalar_one_or_none()
+            if category_instance is None:
+                raise HTTPException(status_code=400, detail=f"Категория с таким id не существует")
 
-                return category_instance.id
-            
-            except Exception as e:
-                await session.rollback()
-                raise HTTPException(status_code=400, detail=f"Категория с таким именем уже существует")
+            # Доход стал расходом (или наоборот): знак всех операций категории
+            # поменялся, остатки кошелька пересчитываются в той же транзакции
+            new_type = getattr(new_data["category_type"], "value", new_data["category_type"])
+            if old is not None and getattr(old.category_type, "value", old.category_type) != new_type:
+                await rebuild_balances(session, wallet_id)
+
+            await session.commit()
+            category_cache.put(category_instance)
+            analytics_cache.invalidate(wallet_id)
+
+            return category_instance.id
+        
+        except HTTPException:
+            await session.rollback()
+            raise
+
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Категория с таким id не существует")
+
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(status_code=400, detail=f"Категория с таким именем уже существует")
 
     @classmethod
-    async def delete_one(cls, category_id: int):
-        async with new_session() as session:
-            try:
-                category_instance = await cls.get_one(category_id)
+    async def delete_one(cls, session: AsyncSession, wallet_id: int, category_id: int):
+        try:
+            response = await session.execute(
+                delete(Category)
+                .where(Category.id == int(category_id), Category.wallet_id == wallet_id)
+                .returning(Category.id)
+            )
+            deleted_id = response.scalar_one_or_none()
+            if deleted_id is None:
+                raise HTTPException(status_code=400, detail=f"Категория не найдена")
 
-                await session.delete(category_instance)
-                await session.commit()
+            await session.commit()
+            category_cache.remove(wallet_id, deleted_id)
+            analytics_cache.invalidate(wallet_id)
 
-            except IntegrityError:
-                raise HTTPException(status_code=400, detail=f"В этой категории есть записи")
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(status_code=400, detail=f"В этой категории есть записи")
 
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Категория не найдена")
\ No newline at end of file
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(status_code=400, detail=f"Категория не найдена")
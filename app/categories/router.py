@@ -1,11 +1,9 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
-
 from app.categories.repository import CategoryRepo
 from app.categories.schemas import CategoryType, CreateCategory
-from app.database import new_session, Category
+from app.database import SessionDep, WalletDep
 
 
 router = APIRouter(
@@ -15,23 +13,20 @@ router = APIRouter(
 
 # List (by_type)
 @router.get("/", description="Все категории (доходов или расходов).")
-async def get_categories_by_type(type: CategoryType):
-    async with new_session() as session:
-        query = select(Category).where(Category.category_type == type)
-        response = await session.execute(query)
-        result = response.scalars().all()
+async def get_categories_by_type(wallet_id: WalletDep, type: CategoryType):
+    result = await CategoryRepo.get_by_type(wallet_id, type)
 
-        if result is not None and len(result) > 0:
-            return result
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Категорий не добавлено"
-        )
+    if result is not None and len(result) > 0:
+        return result
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Категорий не добавлено"
+    )
 
 # List (all)
 @router.get("/all/", description="Вывести вообще все категории.")
-async def get_all_category():
-    categories = await CategoryRepo.get_all()
+async def get_all_category(wallet_id: WalletDep):
+    categories = await CategoryRepo.get_all(wallet_id)
     
     if categories is not None and len(categories) > 0:
         return categories
@@ -43,9 +38,11 @@ async def get_all_category():
 
 # Create
 @router.post("/create/", description="Создать категорию.")
-async def create_category(data: Annotated[CreateCategory, Depends()]) -> dict[str, str]:
+async def create_category(
+    session: SessionDep, wallet_id: WalletDep, data: Annotated[CreateCategory, Depends()]
+) -> dict[str, str]:
         try:
-            new_category = await CategoryRepo.create_one(data)
+            new_category = await CategoryRepo.create_one(session, wallet_id, data)
             return {"message": "Категория успешно создана:", "id": str(new_category)}
 
         except Exception as e:
@@ -53,9 +50,9 @@ async def create_category(data: Annotated[CreateCategory, Depends()]) -> dict[st
 
 # Retrieve
 @router.get("/{category_id}", description="Получить категорию по id.")
-async def get_one_category(category_id: str):
+async def get_one_category(wallet_id: WalletDep, category_id: str):
     try:
-        category_data = await CategoryRepo.get_one(category_id)
+        category_data = await CategoryRepo.get_one(wallet_id, category_id)
         return category_data
 
     except Exception as e:
@@ -65,11 +62,13 @@ async def get_one_category(category_id: str):
 # Update
 @router.patch("/{category_id}/edit/", description="Изменить категорию.")
 async def update_category(
+    session: SessionDep,
+    wallet_id: WalletDep,
     category_id: str,
     data: Annotated[CreateCategory, Depends()])  -> dict[str, str]:
     
     try:
-        updated_category = await CategoryRepo.update_one(category_id, data) 
+        updated_category = await CategoryRepo.update_one(session, wallet_id, category_id, data) 
         return {"message": "Категория успешно изменена:", "id": str(updated_category)}
 
     except Exception as e:
@@ -78,9 +77,9 @@ async def update_category(
 
 # Delete
 @router.delete("/{category_id}/delete/", description="Удалить категорию.")
-async def delete_category(category_id: str):
+async def delete_category(session: SessionDep, wallet_id: WalletDep, category_id: str):
     try:
-        await CategoryRepo.delete_one(category_id)
+        await CategoryRepo.delete_one(session, wallet_id, category_id)
         return {"message": "Категория успешно удалена"}
     except Exception as e:
         raise HTTPException(status_code=e.status_code, detail=str(e.detail))
@@ -1,13 +1,191 @@
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import date
-from typing import List
+from typing import Annotated, AsyncIterator, List
 
-from sqlalchemy import ForeignKey, Enum, UniqueConstraint
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from fastapi import Depends, Header, HTTPException, status
+
+from sqlalchemy import BigInteger, ForeignKey, Enum, Index, String, UniqueConstraint, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, declared_attr
 
-db_url = "sqlite+aiosqlite:///finance.db"
-engine = create_async_engine(db_url)
+from app.config import settings
+from app.metrics import instrument_engine
+
+
+def sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            # WAL хранится в файле базы, достаточно выставить со стороны записи
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}")
+        cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+        cursor.close()
+    return on_connect
+
+
+def make_engine(url: str, pool_size: int, read_only: bool = False) -> AsyncEngine:
+    options = {}
+    database_url = make_url(url)
+    if database_url.database not in (None, "", ":memory:"):
+        options["pool_size"] = pool_size
+        options["max_overflow"] = settings.max_overflow
+    if database_url.get_backend_name() == "postgresql":
+        # Серверная база: проверяем соединения и пересоздаём старые
+        options["pool_pre_ping"] = True
+        options["pool_recycle"] = settings.pool_recycle
+        if read_only:
+            options["connect_args"] = {
+                "server_settings": {"default_transaction_read_only": "on"}
+            }
+
+    new_engine = create_async_engine(url, **options)
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", sqlite_pragmas(read_only))
+    return new_engine
+
+
+engine = make_engine(settings.database_url, settings.pool_size)
+# Читатели (GET-роуты) не ждут в одном пуле с писателями
+read_engine = make_engine(
+    settings.read_database_url or settings.database_url,
+    settings.read_pool_size,
+    read_only=True,
+)
+instrument_engine(engine)
+instrument_engine(read_engine)
 new_session = async_sessionmaker(engine, expire_on_commit=False)
+new_read_session = async_sessionmaker(read_engine, expire_on_commit=False)
+
+
+DEFAULT_WALLET_ID = 1
+
+
+def get_wallet_id(x_wallet_id: Annotated[int, Header(ge=1)] = DEFAULT_WALLET_ID) -> int:
+    # Кошелёк, к которому относится запрос; до авторизации - из заголовка X-Wallet-Id
+    return x_wallet_id
+
+
+WalletDep = Annotated[int, Depends(get_wallet_id)]
+
+
+# TENANT_DATABASE_DIR: у каждого кошелька свой файл SQLite и свои пулы,
+# большой журнал одного кошелька не мешает остальным ни чтением, ни блокировками.
+# Открытыми держим не больше TENANT_ENGINES_MAX кошельков, давно не нужные закрываются
+tenant_sessions: OrderedDict[int, tuple[async_sessionmaker, async_sessionmaker]] = OrderedDict()
+tenant_engines: dict[int, tuple[AsyncEngine, AsyncEngine]] = {}
+tenant_lock = asyncio.Lock()
+
+
+TENANT_FILE = re.compile(r"^wallet_(\d+)\.db$")
+
+
+def tenant_path(wallet_id: int) -> str:
+    return os.path.join(settings.tenant_database_dir, f"wallet_{wallet_id}.db")
+
+
+def tenant_files() -> list[tuple[int, str]]:
+    # Уже созданные файлы кошельков: (id кошелька, путь)
+    if settings.tenant_database_dir is None or not os.path.isdir(settings.tenant_database_dir):
+        return []
+    files = []
+    for name in sorted(os.listdir(settings.tenant_database_dir)):
+        match = TENANT_FILE.match(name)
+        if match:
+            files.append((int(match.group(1)), os.path.join(settings.tenant_database_dir, name)))
+    return files
+
+
+async def open_tenant(wallet_id: int) -> tuple[async_sessionmaker, async_sessionmaker]:
+    # Только заведённые кошельки: файл создаёт python -m app.migrations create --wallet N.
+    # Иначе любой X-Wallet-Id создавал бы файл, пулы и прогонял миграции
+    path = tenant_path(wallet_id)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Кошелёк не найден")
+
+    write_engine = make_engine(f"sqlite+aiosqlite:///{path}", settings.pool_size)
+    tenant_read_engine = make_engine(
+        f"sqlite+aiosqlite:///{path}", settings.read_pool_size, read_only=True
+    )
+    # Миграции импортируют модели этого модуля, поэтому импорт здесь
+    from app.migrations import prepare_tenant
+
+    try:
+        await prepare_tenant(write_engine, wallet_id)
+    except BaseException:
+        # Движки не попали в реестр: закрываем сразу, иначе каждая повторная попытка их теряет
+        await write_engine.dispose()
+        await tenant_read_engine.dispose()
+        raise
+
+    for tenant_engine in (write_engine, tenant_read_engine):
+        instrument_engine(tenant_engine)
+    tenant_engines[wallet_id] = (write_engine, tenant_read_engine)
+    return (
+        async_sessionmaker(write_engine, expire_on_commit=False),
+        async_sessionmaker(tenant_read_engine, expire_on_commit=False),
+    )
+
+
+async def close_tenant(wallet_id: int):
+    # Соединения, которые сейчас в работе, закроются при возврате в старый пул
+    tenant_sessions.pop(wallet_id, None)
+    for tenant_engine in tenant_engines.pop(wallet_id, ()):
+        await tenant_engine.dispose()
+
+
+async def wallet_sessionmakers(wallet_id: int) -> tuple[async_sessionmaker, async_sessionmaker]:
+    if settings.tenant_database_dir is None:
+        return new_session, new_read_session
+
+    makers = tenant_sessions.get(wallet_id)
+    if makers is None:
+        async with tenant_lock:
+            makers = tenant_sessions.get(wallet_id)
+            if makers is None:
+                makers = await open_tenant(wallet_id)
+                tenant_sessions[wallet_id] = makers
+                while len(tenant_sessions) > settings.tenant_engines_max:
+                    await close_tenant(next(iter(tenant_sessions)))
+    if wallet_id in tenant_sessions:
+        tenant_sessions.move_to_end(wallet_id)
+    return makers
+
+
+@asynccontextmanager
+async def wallet_session(wallet_id: int, read_only: bool = False) -> AsyncIterator[AsyncSession]:
+    makers = await wallet_sessionmakers(wallet_id)
+    async with makers[read_only]() as session:
+        yield session
+
+
+async def dispose_tenants():
+    for wallet_id in list(tenant_engines):
+        await close_tenant(wallet_id)
+
+
+# Одна сессия на запрос: роуты получают её зависимостью и передают в репозитории
+async def get_session(wallet_id: WalletDep) -> AsyncIterator[AsyncSession]:
+    async with wallet_session(wallet_id) as session:
+        yield session
+
+
+async def get_read_session(wallet_id: WalletDep) -> AsyncIterator[AsyncSession]:
+    async with wallet_session(wallet_id, read_only=True) as session:
+        yield session
+
+
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
 
 class Model(DeclarativeBase):
     __abstract__ = True
@@ -20,25 +198,68 @@ class Category(Model):
     
     # Добавить ВАЛИДАТОР - category_type in ("income", "expense")
     
+    wallet_id: Mapped[int] = mapped_column()
     name: Mapped[str] = mapped_column()
-    category_type: Mapped[str] = mapped_column(Enum("income", "expense"), nullable=False)
+    category_type: Mapped[str] = mapped_column(
+        Enum("income", "expense", name="category_type"), nullable=False  # В PostgreSQL - нативный ENUM
+    )
     
     operations: Mapped[List["Operation"]] = relationship("Operation", back_populates="category")
     
     __table_args__ = (
-        UniqueConstraint('category_type', 'name', name='uq_type_name'),  # Уникальное сочетание
+        # Все индексы начинаются с кошелька: запросы одного кошелька не читают чужие строки
+        UniqueConstraint('wallet_id', 'category_type', 'name', name='uq_wallet_type_name'),
+        Index('ix_categories_wallet_type_id', 'wallet_id', 'category_type', 'id'),
     )
 
 class Operation(Model):
     __tablename__ = 'operations'
 
-    amount: Mapped[float] = mapped_column()
-    created_at: Mapped[date] = mapped_column(default=date.today())
+    wallet_id: Mapped[int] = mapped_column()
+    # Сумма в минорных единицах валюты (копейках), см. app/money.py
+    amount_minor: Mapped[int] = mapped_column(BigInteger)
+    currency: Mapped[str] = mapped_column(String(3), default=lambda: settings.default_currency)
+    created_at: Mapped[date] = mapped_column(default=date.today)
     description: Mapped[str] = mapped_column()
 
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id")) 
     category: Mapped[Category] = relationship("Category", back_populates="operations")
 
-async def create_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(Model.metadata.create_all)
\ No newline at end of file
+    __table_args__ = (
+        Index('ix_operations_wallet_created_at_category_id', 'wallet_id', 'created_at', 'category_id'),  # Выборки за период
+        Index('ix_operations_wallet_created_at_id', 'wallet_id', 'created_at', 'id'),  # Постраничный вывод по курсору
+    )
+
+
+class DailyCategoryTotal(Model):
+    __tablename__ = 'daily_category_totals'
+
+    # Агрегат операций за день по категории и валюте, обновляется вместе с операциями
+    wallet_id: Mapped[int] = mapped_column()
+    day: Mapped[date] = mapped_column()
+    category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"))
+    currency: Mapped[str] = mapped_column(String(3))
+    total_minor: Mapped[int] = mapped_column(BigInteger, default=0)
+    count: Mapped[int] = mapped_column(default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            'wallet_id', 'day', 'category_id', 'currency', name='uq_wallet_day_category_currency'
+        ),
+    )
+
+
+class MonthlyBalance(Model):
+    __tablename__ = 'monthly_balances'
+
+    # Контрольные точки остатка: движение за месяц и остаток на его конец.
+    # Остаток на любую дату = closing прошлого месяца + хвост текущего из дневного агрегата
+    wallet_id: Mapped[int] = mapped_column()
+    currency: Mapped[str] = mapped_column(String(3))
+    month: Mapped[date] = mapped_column()
+    net_minor: Mapped[int] = mapped_column(BigInteger, default=0)
+    closing_minor: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('wallet_id', 'currency', 'month', name='uq_wallet_currency_month'),
+    )
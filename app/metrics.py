@@ -0,0 +1,178 @@
+import logging
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+slow_query_log = logging.getLogger("app.slow_queries")
+
+# Границы гистограммы времени ответа, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_time: float = 0
+    rows: int = 0
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    duration: float = 0
+    db_time: float = 0
+    statements: int = 0
+    rows: int = 0
+    buckets: list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+endpoints: dict[tuple[str, str, int], EndpointStats] = defaultdict(EndpointStats)
+totals = RequestStats()
+
+
+def affected_rows(cursor) -> int:
+    # INSERT/UPDATE/DELETE без RETURNING - затронутые строки по rowcount.
+    # Строки выборок считает fetched: для SELECT sqlite3 отдаёт rowcount -1
+    if cursor.description is not None:
+        return 0
+    return max(cursor.rowcount, 0)
+
+
+def fetched(rows):
+    # Строки, полученные из базы: вызывается там, где выбирается результат
+    # (репозитории, кэш категорий, аналитика). Возвращает те же строки
+    totals.rows += len(rows)
+    stats = current_request.get()
+    if stats is not None:
+        stats.rows += len(rows)
+    return rows
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    rows = affected_rows(cursor)
+
+    totals.statements += 1
+    totals.db_time += elapsed
+    totals.rows += rows
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+        stats.rows += rows
+
+    if elapsed * 1000 >= settings.slow_query_ms:
+        slow_query_log.warning(
+            "Медленный запрос %.1f мс: %s; параметры: %r",
+            elapsed * 1000, statement, parameters,
+        )
+
+
+def instrument_engine(engine: AsyncEngine):
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+def record(request: Request, status_code: int, stats: RequestStats, duration: float):
+    # Шаблон пути, а не сам путь: /api/operations/{operation_id}/
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    endpoint = endpoints[(request.method, path, status_code)]
+    endpoint.requests += 1
+    endpoint.duration += duration
+    endpoint.db_time += stats.db_time
+    endpoint.statements += stats.statements
+    endpoint.rows += stats.rows
+    for number, bound in enumerate(BUCKETS):
+        if duration <= bound:
+            endpoint.buckets[number] += 1
+
+
+async def metrics_middleware(request: Request, call_next):
+    stats = RequestStats()
+    token = current_request.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        current_request.reset(token)
+    duration = time.perf_counter() - started
+
+    # Разбивка времени для клиента: база и всё остальное (ORM, сериализация).
+    # Заголовки уходят до тела, поэтому запросы потоковой выгрузки сюда не попадают
+    response.headers["Server-Timing"] = (
+        f"db;dur={stats.db_time * 1000:.2f}, app;dur={(duration - stats.db_time) * 1000:.2f}"
+    )
+    response.headers["X-DB-Statements"] = str(stats.statements)
+
+    # Тело (StreamingResponse, например export) читает базу уже после call_next:
+    # в метрики эндпоинта запрос попадает, когда тело отдано целиком
+    body = response.body_iterator
+
+    async def body_with_metrics():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            record(request, response.status_code, stats, time.perf_counter() - started)
+
+    response.body_iterator = body_with_metrics()
+    return response
+
+
+def render_prometheus() -> str:
+    lines = [
+        "# HELP http_request_duration_seconds Время обработки запроса",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, path, status), endpoint in sorted(endpoints.items()):
+        labels = f'method="{method}",path="{path}",status="{status}"'
+        for bound, count in zip(BUCKETS, endpoint.buckets):
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {endpoint.requests}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {endpoint.duration:.6f}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {endpoint.requests}")
+
+    per_endpoint = (
+        ("http_request_db_seconds_total", "Время в базе данных", "db_time"),
+        ("http_request_db_statements_total", "SQL-запросов", "statements"),
+        ("http_request_db_rows_total", "Строк получено из базы и изменено в ней", "rows"),
+    )
+    for name, help_text, field in per_endpoint:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (method, path, status), endpoint in sorted(endpoints.items()):
+            labels = f'method="{method}",path="{path}",status="{status}"'
+            lines.append(f"{name}{{{labels}}} {getattr(endpoint, field)}")
+
+    lines += [
+        "# HELP db_statements_total Всего SQL-запросов процесса, включая фоновые",
+        "# TYPE db_statements_total counter",
+        f"db_statements_total {totals.statements}",
+        "# HELP db_seconds_total Всего времени в базе данных",
+        "# TYPE db_seconds_total counter",
+        f"db_seconds_total {totals.db_time:.6f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+router = APIRouter(tags=["Метрики"])
+
+
+@router.get("/metrics", description="Метрики в формате Prometheus", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,77 @@
+"""Версионированные миграции схемы.
+
+Схему меняет только команда python -m app.migrations upgrade (перед выкладкой),
+воркер при старте лишь сверяет номер версии одним запросом.
+"""
+from typing import Optional
+
+from sqlalchemy import Column, Integer, MetaData, Table, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.database import DEFAULT_WALLET_ID, engine
+from app.migrations.versions import MIGRATIONS
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Отдельные метаданные: create_all моделей не трогает таблицу версий
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, nullable=False),
+)
+
+
+class SchemaError(RuntimeError):
+    pass
+
+
+async def read_version(conn: AsyncConnection) -> Optional[int]:
+    return await conn.scalar(select(schema_version.c.version))
+
+
+async def current_version(target: AsyncEngine = engine) -> int:
+    # 0 - база без таблицы версий: пустая или созданная до миграций
+    async with target.connect() as conn:
+        try:
+            return await read_version(conn) or 0
+        except DBAPIError:
+            return 0
+
+
+async def check_schema(target: AsyncEngine = engine):
+    version = await current_version(target)
+    if version != LATEST_VERSION:
+        raise SchemaError(
+            f"Версия схемы базы {version}, код рассчитан на {LATEST_VERSION}: "
+            "выполните python -m app.migrations upgrade"
+        )
+
+
+async def upgrade(target: AsyncEngine = engine, wallet_id: int = DEFAULT_WALLET_ID) -> list[str]:
+    # Каждый шаг - своя транзакция вместе с записью номера версии.
+    # wallet_id - кошелёк для записей из базы, созданной до кошельков
+    async with target.begin() as conn:
+        await conn.run_sync(schema_version.metadata.create_all)
+        if await read_version(conn) is None:
+            await conn.execute(schema_version.insert().values(version=0))
+
+    done = []
+    for version, name, step in MIGRATIONS:
+        async with target.begin() as conn:
+            # Перечитываем в транзакции: параллельный upgrade мог уже применить шаг
+            if await read_version(conn) >= version:
+                continue
+            lines = await step(conn, wallet_id)
+            await conn.execute(schema_version.update().values(version=version))
+        done.append(f"Версия {version}: {name}")
+        done += [f"  {line}" for line in lines]
+    return done
+
+
+async def prepare_tenant(target: AsyncEngine, wallet_id: int):
+    # Пустой файл заведённого кошелька получает схему при первом обращении.
+    # Файл с версией только проверяется: обновляет его upgrade перед выкладкой
+    if await current_version(target) == 0:
+        await upgrade(target, wallet_id)
+    await check_schema(target)
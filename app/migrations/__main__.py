@@ -0,0 +1,66 @@
+"""Миграции схемы.
+
+Запуск из корня проекта:
+    python -m app.migrations upgrade [--wallet 1]   - применить недостающие версии
+    python -m app.migrations current                - показать версию базы
+    python -m app.migrations create --wallet 2      - завести кошелёк (режим TENANT_DATABASE_DIR)
+В режиме TENANT_DATABASE_DIR upgrade и current проходят и по всем файлам кошельков,
+запросы к кошельку без файла получают 404.
+--wallet - кошелёк для записей из общей базы, созданной до кошельков.
+"""
+import argparse
+import asyncio
+import os
+
+from app.config import settings
+from app.database import DEFAULT_WALLET_ID, engine, make_engine, tenant_files, tenant_path
+from app.migrations import LATEST_VERSION, current_version, upgrade
+
+
+async def run(command: str, target, wallet_id: int, title: str):
+    if command == "current":
+        print(f"{title}: версия {await current_version(target)} из {LATEST_VERSION}")
+        return
+    done = await upgrade(target, wallet_id)
+    print(f"{title}: " + ("обновлена" if done else f"уже версии {LATEST_VERSION}"))
+    for line in done:
+        print(f"  {line}")
+
+
+async def create(wallet_id: int) -> int:
+    if settings.tenant_database_dir is None:
+        print("Кошельки в общей базе заводить не нужно: TENANT_DATABASE_DIR не задан")
+        return 1
+    path = tenant_path(wallet_id)
+    if os.path.exists(path):
+        print(f"{path}: кошелёк уже заведён")
+        return 1
+    os.makedirs(settings.tenant_database_dir, exist_ok=True)
+    tenant_engine = make_engine(f"sqlite+aiosqlite:///{path}", 1)
+    try:
+        await run("upgrade", tenant_engine, wallet_id, path)
+    finally:
+        await tenant_engine.dispose()
+    return 0
+
+
+async def main(command: str, wallet_id: int) -> int:
+    if command == "create":
+        return await create(wallet_id)
+    await run(command, engine, wallet_id, "Общая база")
+    for tenant_id, path in tenant_files():
+        tenant_engine = make_engine(f"sqlite+aiosqlite:///{path}", 1)
+        try:
+            await run(command, tenant_engine, tenant_id, path)
+        finally:
+            await tenant_engine.dispose()
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["upgrade", "current", "create"])
+    parser.add_argument("--wallet", type=int, default=DEFAULT_WALLET_ID)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.command, args.wallet)))
@@ -0,0 +1,292 @@
+"""Шаги схемы по версиям. Номер шага = номер версии, уже выпущенные шаги не меняются:
+новое изменение схемы - новый шаг в конце MIGRATIONS.
+
+Каждый шаг проверяет текущее состояние базы и пропускает сделанное, поэтому
+версия 1 одинаково доводит и пустую базу, и базу, созданную до появления версий.
+Шаги не строят схему по текущим моделям: модели меняются вместе со следующими шагами,
+поэтому таблицы версии 1 записаны здесь как есть (schema_v1).
+"""
+import re
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Date,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    UniqueConstraint,
+    cast,
+    column,
+    func,
+    inspect,
+    select,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.schema import CreateTable
+
+from app.analytics.balances import rebuild_balances
+from app.analytics.rollup import rebuild_rollup
+from app.config import settings
+from app.database import DailyCategoryTotal, MonthlyBalance, Operation
+from app.money import CURRENCY_PATTERN, minor_digits
+
+# Схема версии 1 - снимок моделей на момент выпуска, дальше не меняется
+schema_v1 = MetaData()
+
+Table(
+    "categories", schema_v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("wallet_id", Integer, nullable=False),
+    Column("name", String, nullable=False),
+    Column("category_type", Enum("income", "expense", name="category_type"), nullable=False),
+    UniqueConstraint("wallet_id", "category_type", "name", name="uq_wallet_type_name"),
+    Index("ix_categories_wallet_type_id", "wallet_id", "category_type", "id"),
+)
+Table(
+    "operations", schema_v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("wallet_id", Integer, nullable=False),
+    Column("amount_minor", BigInteger, nullable=False),
+    Column("currency", String(3), nullable=False),
+    Column("created_at", Date, nullable=False),
+    Column("description", String, nullable=False),
+    Column("category_id", Integer, ForeignKey("categories.id"), nullable=False),
+    Index("ix_operations_wallet_created_at_category_id", "wallet_id", "created_at", "category_id"),
+    Index("ix_operations_wallet_created_at_id", "wallet_id", "created_at", "id"),
+)
+Table(
+    "daily_category_totals", schema_v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("wallet_id", Integer, nullable=False),
+    Column("day", Date, nullable=False),
+    Column("category_id", Integer, ForeignKey("categories.id"), nullable=False),
+    Column("currency", String(3), nullable=False),
+    Column("total_minor", BigInteger, nullable=False),
+    Column("count", Integer, nullable=False),
+    UniqueConstraint("wallet_id", "day", "category_id", "currency", name="uq_wallet_day_category_currency"),
+)
+Table(
+    "monthly_balances", schema_v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("wallet_id", Integer, nullable=False),
+    Column("currency", String(3), nullable=False),
+    Column("month", Date, nullable=False),
+    Column("net_minor", BigInteger, nullable=False),
+    Column("closing_minor", BigInteger, nullable=False),
+    UniqueConstraint("wallet_id", "currency", "month", name="uq_wallet_currency_month"),
+)
+
+# Индексы без кошелька в начале: после перехода на кошельки только мешают планировщику
+OLD_INDEXES = (
+    "ix_categories_type_id",
+    "ix_operations_created_at_category_id",
+    "ix_operations_created_at_id",
+)
+SEARCH_TRIGGERS = (
+    "operations_fts_insert",
+    "operations_fts_update",
+    "operations_fts_delete",
+    "operations_fts_category_rename",
+)
+
+
+def table_columns(conn) -> dict[str, set[str]]:
+    inspector = inspect(conn)
+    return {
+        name: {item["name"] for item in inspector.get_columns(name)}
+        for name in inspector.get_table_names()
+    }
+
+
+async def migrate_money(conn: AsyncConnection, columns: dict[str, set[str]]) -> list[str]:
+    # operations.amount (REAL) -> amount_minor (BIGINT) и currency
+    currency = settings.default_currency
+    if not re.match(CURRENCY_PATTERN, currency):
+        raise SystemExit(f"Некорректная DEFAULT_CURRENCY: {currency}")
+
+    operations = columns.get("operations", set())
+    if "amount" not in operations:
+        return []
+
+    if "amount_minor" not in operations:
+        await conn.execute(text(
+            "ALTER TABLE operations ADD COLUMN amount_minor BIGINT NOT NULL DEFAULT 0"
+        ))
+    if "currency" not in operations:
+        await conn.execute(text(
+            f"ALTER TABLE operations ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{currency}'"
+        ))
+    # Старые суммы считаем записанными в валюте по умолчанию
+    legacy = table("operations", column("amount"), column("amount_minor"))
+    factor = 10 ** minor_digits(currency)
+    result = await conn.execute(
+        update(legacy).values(amount_minor=cast(func.round(legacy.c.amount * factor), BigInteger))
+    )
+    await conn.execute(text("ALTER TABLE operations DROP COLUMN amount"))
+    return [f"operations: {result.rowcount} сумм переведено в {currency} * {factor}"]
+
+
+def rebuild_categories_sqlite(conn, wallet_id: int):
+    # SQLite не удаляет ограничение UNIQUE из таблицы: пересоздаём её
+    # (новая таблица, копия строк, удаление старой, переименование).
+    # Триггеры поиска ссылаются на categories и мешают переименованию,
+    # шаг поискового индекса создаёт их заново
+    for trigger in SEARCH_TRIGGERS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    new_table = schema_v1.tables["categories"].to_metadata(MetaData(), name="categories_new")
+    conn.execute(CreateTable(new_table))
+    conn.execute(text(
+        "INSERT INTO categories_new (id, wallet_id, name, category_type) "
+        f"SELECT id, {wallet_id}, name, category_type FROM categories"
+    ))
+    conn.execute(text("DROP TABLE categories"))
+    conn.execute(text("ALTER TABLE categories_new RENAME TO categories"))
+
+
+async def migrate_wallets(
+    conn: AsyncConnection, columns: dict[str, set[str]], wallet_id: int
+) -> list[str]:
+    # wallet_id в категориях и операциях: все старые записи - в кошелёк wallet_id
+    done = []
+    if "categories" in columns and "wallet_id" not in columns["categories"]:
+        if conn.dialect.name == "sqlite":
+            await conn.run_sync(rebuild_categories_sqlite, wallet_id)
+        else:
+            await conn.execute(text(
+                f"ALTER TABLE categories ADD COLUMN wallet_id INTEGER NOT NULL DEFAULT {wallet_id}"
+            ))
+            await conn.execute(text("ALTER TABLE categories DROP CONSTRAINT uq_type_name"))
+            await conn.execute(text(
+                "ALTER TABLE categories ADD CONSTRAINT uq_wallet_type_name "
+                "UNIQUE (wallet_id, category_type, name)"
+            ))
+        done.append(f"categories: записи перенесены в кошелёк {wallet_id}")
+
+    if "operations" in columns and "wallet_id" not in columns["operations"]:
+        await conn.execute(text(
+            f"ALTER TABLE operations ADD COLUMN wallet_id INTEGER NOT NULL DEFAULT {wallet_id}"
+        ))
+        done.append(f"operations: записи перенесены в кошелёк {wallet_id}")
+
+    for index in OLD_INDEXES:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    return done
+
+
+def create_indexes(conn):
+    # create_all не добавляет индексы в уже существующие таблицы
+    for v1_table in schema_v1.sorted_tables:
+        for index in v1_table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def baseline(conn: AsyncConnection, wallet_id: int) -> list[str]:
+    columns = await conn.run_sync(table_columns)
+    done = await migrate_money(conn, columns)
+    done += await migrate_wallets(conn, columns, wallet_id)
+
+    # Агрегат производный: старый формат проще удалить, шаг 3 соберёт заново
+    rollup_columns = columns.get("daily_category_totals", set())
+    if rollup_columns and not {"wallet_id", "total_minor"} <= rollup_columns:
+        await conn.run_sync(schema_v1.tables["daily_category_totals"].drop)
+        done.append("daily_category_totals: удалён старый формат")
+
+    await conn.run_sync(schema_v1.create_all)
+    await conn.run_sync(create_indexes)
+    return done
+
+
+# Полнотекстовый индекс по описанию и имени категории (SQLite FTS5).
+# rowid строки индекса = id операции; синхронизацию держат триггеры,
+# так что её не обходят ни пакетная загрузка, ни очередь записи
+SEARCH_INDEX_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS operations_fts USING fts5(
+        description, category,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS operations_fts_insert AFTER INSERT ON operations BEGIN
+        INSERT INTO operations_fts (rowid, description, category)
+        VALUES (new.id, new.description, (SELECT name FROM categories WHERE id = new.category_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS operations_fts_update
+    AFTER UPDATE OF description, category_id ON operations BEGIN
+        UPDATE operations_fts
+        SET description = new.description,
+            category = (SELECT name FROM categories WHERE id = new.category_id)
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS operations_fts_delete AFTER DELETE ON operations BEGIN
+        DELETE FROM operations_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS operations_fts_category_rename
+    AFTER UPDATE OF name ON categories WHEN old.name IS NOT new.name BEGIN
+        UPDATE operations_fts SET category = new.name
+        WHERE rowid IN (SELECT id FROM operations WHERE category_id = new.id);
+    END
+    """,
+)
+
+
+def create_search_index(conn) -> list[str]:
+    # В PostgreSQL поиск идёт через ILIKE, индекс не нужен
+    if conn.dialect.name != "sqlite":
+        return []
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'operations_fts'"
+    ).first()
+    for statement in SEARCH_INDEX_DDL:
+        conn.exec_driver_sql(statement)
+    if exists is not None:
+        return []
+    # Индекс появился на базе с историей: заполняем его один раз
+    result = conn.exec_driver_sql(
+        """
+        INSERT INTO operations_fts (rowid, description, category)
+        SELECT operations.id, operations.description, categories.name
+        FROM operations JOIN categories ON categories.id = operations.category_id
+        """
+    )
+    return [f"operations_fts: проиндексировано операций: {result.rowcount}"] if result.rowcount else []
+
+
+async def search_index(conn: AsyncConnection, wallet_id: int) -> list[str]:
+    return await conn.run_sync(create_search_index)
+
+
+async def fill_rollup(conn: AsyncConnection, wallet_id: int) -> list[str]:
+    # Дневной агрегат и месячные остатки для базы, где операции уже есть
+    async with AsyncSession(bind=conn) as session:
+        has_rollup = await session.scalar(select(DailyCategoryTotal.id).limit(1))
+        has_operations = await session.scalar(select(Operation.id).limit(1))
+        has_balances = await session.scalar(select(MonthlyBalance.id).limit(1))
+        if has_rollup is None and has_operations is not None:
+            return [f"Агрегат пересобран, строк: {await rebuild_rollup(session)}"]
+        if has_rollup is not None and has_balances is None:
+            return [f"Месячные остатки собраны, строк: {await rebuild_balances(session)}"]
+    return []
+
+
+# (версия, название, шаг)
+MIGRATIONS = (
+    (1, "кошельки, целые суммы, таблицы и индексы", baseline),
+    (2, "поисковый индекс операций", search_index),
+    (3, "заполнение агрегата и остатков", fill_rollup),
+)
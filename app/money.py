@@ -0,0 +1,37 @@
+from decimal import Decimal
+from functools import lru_cache
+
+# Суммы хранятся целым числом минорных единиц (копейки, центы).
+# Знаков после запятой у валюты; для остальных - 2
+MINOR_DIGITS = {
+    "JPY": 0, "KRW": 0, "VND": 0, "CLP": 0, "ISK": 0,
+    "BHD": 3, "KWD": 3, "OMR": 3, "JOD": 3, "TND": 3,
+}
+CURRENCY_PATTERN = "^[A-Z]{3}$"
+# amount_minor - BIGINT; предел с запасом, чтобы не переполнялись и суммы
+# в дневном агрегате и месячных остатках
+MAX_MINOR = 10**15
+
+
+def minor_digits(currency: str) -> int:
+    return MINOR_DIGITS.get(currency, 2)
+
+
+def to_minor(amount: Decimal, currency: str) -> int:
+    digits = minor_digits(currency)
+    minor = amount.scaleb(digits)
+    if minor != minor.to_integral_value():
+        raise ValueError(f"Для {currency} допустимо не больше {digits} знаков после запятой")
+    if abs(minor) > MAX_MINOR:
+        raise ValueError(f"Сумма по модулю не больше {from_minor(MAX_MINOR, currency)}")
+    return int(minor)
+
+
+@lru_cache
+def minor_unit(currency: str) -> Decimal:
+    return Decimal(1).scaleb(-minor_digits(currency))
+
+
+def from_minor(amount: int, currency: str) -> Decimal:
+    # В Decimal переводим только на выходе из API; умножение на 0.01 точное
+    return Decimal(amount or 0) * minor_unit(currency)
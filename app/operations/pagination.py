@@ -0,0 +1,23 @@
+import base64
+from datetime import date
+
+from fastapi import HTTPException, status
+
+
+# Курсор - позиция последней выданной записи (created_at, id)
+def encode_cursor(created_at: date, operation_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{operation_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, operation_id = raw.split("|")
+        return date.fromisoformat(created_at), int(operation_id)
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
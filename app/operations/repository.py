@@ -1,124 +1,415 @@
-from datetime import date, timedelta
-from typing import Annotated, Optional
+import csv
+import io
+import json
+import re
+from datetime import date
+from decimal import Decimal
+from typing import Annotated, AsyncIterator, Optional
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from pydantic import ValidationError
+from sqlalchemy import Row, and_, column, delete, insert, literal_column, or_, select, table, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.operations.schemas import OperationCreate, OperationGet
-from app.database import Category, Operation, new_session
+from app.analytics.balances import lock_balances
+from app.analytics.cache import analytics_cache
+from app.analytics.rollup import apply_delta, apply_deltas
+from app.categories.cache import category_cache
+from app.categories.schemas import CategoryType
+from app.metrics import fetched
+from app.money import from_minor, to_minor
+from app.operations.pagination import decode_cursor, encode_cursor
+from app.operations.writer import operation_writer
+from app.operations.schemas import (
+    CategoryRow,
+    ExportFormat,
+    OperationCreate,
+    OperationGet,
+    OperationImport,
+    OperationRow,
+    OperationSearch,
+    OperationWithCategoryRow,
+    PageParams,
+    PeriodParams,
+)
+from app.database import Category, Operation, wallet_session
+from app.responses import encode_decimal
+
+
+EXPORT_CHUNK_SIZE = 1000
+OPERATION_COLUMNS = (
+    Operation.id,
+    Operation.created_at,
+    Operation.amount_minor,
+    Operation.currency,
+    Operation.description,
+    Operation.category_id,
+)
+BULK_CHUNK_SIZE = 500
+SEARCH_TERMS = 10
+# Полнотекстовый индекс создаёт миграция версии 2 (только SQLite)
+operations_fts = table("operations_fts", column("rowid"))
+
+
+def json_default(value):
+    # Суммы в NDJSON - строкой ("10.50"), как и в JSON-ответах; даты - тоже строкой
+    return encode_decimal(value) if isinstance(value, Decimal) else str(value)
 
 
 class OperationsRepo:
     @classmethod
-    async def get_operations(cls, data: Annotated[OperationGet, Depends()]):
-    # Вывод операций ( только доходов \ расходов) за период 1\7\31\365
-        async with new_session() as session:
-            if data.period is None:
-                start_date = date.today() - timedelta(days=364)
-            else:
-                start_date = date.today() - timedelta(days=data.period.value)
-
-            query = select(Operation).join(Category).where(
-                Category.category_type == data.type,
-                Operation.created_at >= start_date
-            )
-            response = await session.execute(query)
-            result = response.scalars().all()
+    async def get_operations(
+        cls, session: AsyncSession, wallet_id: int, data: Annotated[OperationGet, Depends()]
+    ) -> dict:
+    # Вывод операций ( только доходов \ расходов) за период
+        start_date, end_date = data.resolve()
+
+        # Тип фильтруем по id категорий из кэша, без JOIN
+        category_ids = [
+            category.id for category in await category_cache.get_by_type(wallet_id, data.type)
+        ]
+        query = select(*OPERATION_COLUMNS).where(
+            Operation.wallet_id == wallet_id,
+            Operation.category_id.in_(category_ids),
+            Operation.created_at >= start_date,
+            Operation.created_at < end_date,
+        )
+        rows, next_cursor = await cls._fetch_page(session, query, data)
+        return {"items": [OperationRow.from_db(row) for row in rows], "next_cursor": next_cursor}
 
-            if result:
-                return result
+    @classmethod
+    async def get_all(
+        cls, session: AsyncSession, wallet_id: int, period: PeriodParams, page: PageParams
+    ) -> dict:
+        start_date, end_date = period.resolve()
+
+        query = select(*OPERATION_COLUMNS).where(
+            Operation.wallet_id == wallet_id,
+            Operation.created_at >= start_date,
+            Operation.created_at < end_date,
+        )
+        rows, next_cursor = await cls._fetch_page(session, query, page)
+        return {"items": await cls._with_categories(wallet_id, rows), "next_cursor": next_cursor}
+
+    @classmethod
+    async def _with_categories(cls, wallet_id: int, rows: list[Row]) -> list[OperationWithCategoryRow]:
+        # Категория на строку - общий объект из кэша, а не загрузка через selectinload
+        categories = {
+            category.id: CategoryRow(category.id, category.name, category.category_type)
+            for category in await category_cache.get_all(wallet_id)
+        }
+        return [OperationWithCategoryRow.from_db(row, categories.get(row[5])) for row in rows]
+
+    @classmethod
+    async def search(cls, session: AsyncSession, wallet_id: int, data: OperationSearch) -> dict:
+        start_date, end_date = data.resolve()
+        terms = re.findall(r"\w+", data.q.lower())[:SEARCH_TERMS]
+        if not terms:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Операций не найдено"
-            )
+                detail="В запросе нет слов для поиска")
 
-    @classmethod
-    async def get_all(cls, period: Optional[int]):
-        async with new_session() as session:
-            if period is None:
-                start_date = date.today() - timedelta(days=364)
-            else:
-                start_date = date.today() - timedelta(days=period)
-
-            query = (
-            select(Operation)
-            .options(selectinload(Operation.category))  # Загрузка связанных категорий #ЗАПОМНИТЬ
-            .where(Operation.created_at >= start_date)
+        query = select(*OPERATION_COLUMNS).where(
+            Operation.wallet_id == wallet_id,
+            Operation.created_at >= start_date,
+            Operation.created_at < end_date,
         )
+        if session.get_bind().dialect.name == "sqlite":
+            # Каждое слово - префиксный запрос FTS5 в кавычках: спецсинтаксис из q не проходит.
+            # Подзапрос, а не JOIN: при JOIN планировщик идёт по индексу дат
+            # и выполняет MATCH заново на каждую строку периода
+            match = " ".join(f'"{term}"*' for term in terms)
+            query = query.where(Operation.id.in_(
+                select(operations_fts.c.rowid).where(
+                    literal_column("operations_fts").op("MATCH")(match)
+                )
+            ))
+        else:
+            # Без FTS: подстрока в описании или в имени категории (категории - из кэша)
+            categories = await category_cache.get_all(wallet_id)
+            query = query.where(and_(*(
+                or_(
+                    Operation.description.icontains(term, autoescape=True),
+                    Operation.category_id.in_([
+                        category.id for category in categories if term in category.name.lower()
+                    ]),
+                )
+                for term in terms
+            )))
+        rows, next_cursor = await cls._fetch_page(session, query, data)
+        return {"items": await cls._with_categories(wallet_id, rows), "next_cursor": next_cursor}
 
-            response = await session.execute(query)
-            result = response.scalars().all()
-            
-            if result:
-                return result
-            
+    @classmethod
+    async def _fetch_page(
+        cls, session: AsyncSession, query, page: PageParams
+    ) -> tuple[list[Row], Optional[str]]:
+        # Keyset-пагинация: от новых к старым по (created_at, id)
+        if page.after is not None:
+            cursor_date, cursor_id = decode_cursor(page.after)
+            query = query.where(
+                tuple_(Operation.created_at, Operation.id) < tuple_(cursor_date, cursor_id)
+            )
+        query = query.order_by(
+            Operation.created_at.desc(), Operation.id.desc()
+        ).limit(page.limit + 1)
+
+        response = await session.execute(query)
+        result = fetched(response.all())
+
+        if not result and page.after is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Операций не найдено")
 
-        
+        rows = result[:page.limit]
+        next_cursor = None
+        if len(result) > page.limit:
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return rows, next_cursor
+
     @classmethod
-    async def create_one(cls, data: Annotated[OperationCreate, Depends()]) -> int:
-        async with new_session() as session:
-            new_data = data.model_dump()
-            new_operation = Operation(**new_data)
+    async def export(
+        cls,
+        wallet_id: int,
+        start_date: date,
+        end_date: date,
+        type: Optional[CategoryType],
+        export_format: ExportFormat,
+    ) -> AsyncIterator[str]:
+        # Потоковая выгрузка: строки читаются курсором и сразу отдаются клиенту.
+        # Сессия своя: она должна жить, пока отдаётся ответ.
+        # Период разбирает роут: ошибку нужно отдать до начала ответа
 
-            try:
-                session.add(new_operation)
-                await session.commit()
-                await session.flush()
-                return new_operation
+        query = (
+            select(
+                Operation.id,
+                Operation.created_at,
+                Operation.amount_minor.label("amount"),
+                Operation.currency,
+                Operation.description,
+                Operation.category_id,
+                Category.name.label("category"),
+                Category.category_type,
+            )
+            .join(Category)
+            .where(
+                Operation.wallet_id == wallet_id,
+                Operation.created_at >= start_date,
+                Operation.created_at < end_date,
+            )
+            .order_by(Operation.created_at.desc(), Operation.id.desc())
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        if type is not None:
+            query = query.where(Category.category_type == type)
+
+        async with wallet_session(wallet_id, read_only=True) as session:
+            result = await session.stream(query)
+            columns = list(result.keys())
+
+            def convert(rows):
+                return [(row[0], row[1], from_minor(row[2], row[3]), *row[3:]) for row in rows]
+
+            if export_format == ExportFormat.csv:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                async for rows in result.partitions():
+                    writer.writerows(convert(fetched(rows)))
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                if buffer.tell():
+                    yield buffer.getvalue()
+                return
 
-            except Exception as e:
-                raise e
+            async for rows in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=json_default) + "\n"
+                    for row in convert(fetched(rows))
+                )
+
+    @classmethod
+    async def check_category(cls, wallet_id: int, category_id: int, session: Optional[AsyncSession] = None):
+        # Проверка по кэшу категорий; промах (категория другого воркера) - запросом в базу.
+        # Чужие категории не найдутся
+        if await category_cache.get(wallet_id, category_id, session) is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Категория не найдена"
+            )
+
+    @classmethod
+    async def create_one(
+        cls, session: AsyncSession, wallet_id: int, data: Annotated[OperationCreate, Depends()]
+    ) -> Operation:
+        await cls.check_category(wallet_id, data.category_id, session)
+        new_data = data.model_dump(exclude={"amount"})
+        new_data["description"] = new_data["description"] or ""  # В базе поле NOT NULL
+        new_operation = Operation(**new_data, wallet_id=wallet_id, amount_minor=data.amount_minor())
+
+        session.add(new_operation)
+        await session.flush()
+        await apply_delta(
+            session, wallet_id, new_operation.created_at, new_operation.category_id,
+            new_operation.currency, new_operation.amount_minor, 1,
+        )
+        await session.commit()
+        analytics_cache.invalidate(wallet_id)
+        return new_operation
     
     @classmethod
-    async def get_one_operation(cls, operation_id: int):
-        async with new_session() as session:
+    async def enqueue_one(cls, wallet_id: int, data: OperationCreate) -> int:
+        # Режим WRITE_BEHIND: проверки здесь, запись - пачкой в фоновом writer-е
+        await cls.check_category(wallet_id, data.category_id)
+        row = data.model_dump(exclude={"amount"})
+        row["wallet_id"] = wallet_id
+        row["amount_minor"] = data.amount_minor()
+        row["created_at"] = date.today()
+        row["description"] = row["description"] or ""  # В базе поле NOT NULL
+        return await operation_writer.submit(row)
+
+    @classmethod
+    async def create_many(cls, session: AsyncSession, wallet_id: int, rows: list) -> dict:
+        # Пакетная загрузка: категории проверяются по кэшу, вставка пачками, один коммит.
+        # Строка - любой JSON: не объект - ошибка этой строки, а не всего запроса
+        errors = []
+        operations = []
+        for number, row in enumerate(rows):
+            try:
+                operations.append((number, OperationImport.model_validate(row)))
+            except ValidationError as e:
+                errors.append({"row": number, "detail": e.errors(include_url=False, include_context=False)})
+
+        # Все категории пакета - одним обращением: промахи кэша одним запросом
+        categories = await category_cache.get_many(
+            wallet_id, {operation.category_id for _, operation in operations}, session
+        )
+        values = []
+        for number, operation in operations:
+            if operation.category_id not in categories:
+                errors.append({"row": number, "detail": "Категория не найдена"})
+                continue
             try:
-                query = select(Operation).where(Operation.id == operation_id)
-                response = await session.execute(query)
-                result = response.scalar_one()
+                amount_minor = to_minor(operation.amount, operation.currency)
+            except ValueError as e:
+                errors.append({"row": number, "detail": str(e)})
+                continue
+            data = operation.model_dump(exclude={"amount"})
+            data["amount_minor"] = amount_minor
+            data["wallet_id"] = wallet_id
+            data["created_at"] = data["created_at"] or date.today()
+            data["description"] = data["description"] or ""  # В базе поле NOT NULL
+            values.append(data)
+
+        for start in range(0, len(values), BULK_CHUNK_SIZE):
+            await session.execute(insert(Operation), values[start:start + BULK_CHUNK_SIZE])
+
+        await apply_deltas(session, values)
 
-                return result
-            
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Операция не найдена")
+        await session.commit()
+        analytics_cache.invalidate(wallet_id)
+
+        errors.sort(key=lambda error: error["row"])
+        return {"created": len(values), "errors": errors}
+
+    @classmethod
+    async def get_one_operation(cls, session: AsyncSession, wallet_id: int, operation_id: int):
+        try:
+            query = select(*OPERATION_COLUMNS).where(
+                Operation.id == int(operation_id), Operation.wallet_id == wallet_id
+            )
+            response = await session.execute(query)
+            result = fetched([response.one()])[0]
+
+            return OperationRow.from_db(result)
+        
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Операция не найдена")
 
     @classmethod
     async def update_operation(
         cls,
+        session: AsyncSession,
+        wallet_id: int,
         operation_id: int,
         data: Annotated[OperationCreate, Depends()]
         ) -> int:
-        async with new_session() as session:
-            try:
-                new_data = data.model_dump()
-                operation_instance = await cls.get_one_operation(operation_id)
-                
-                operation_instance.category_id = new_data["category_id"]
-                operation_instance.description = new_data["description"]
-                operation_instance.amount = new_data["amount"]
-                
-                session.add(operation_instance)
-                await session.commit()
-                await session.flush()
-                return operation_instance
-            
-            except Exception as e:
-                await session.rollback()
-                raise HTTPException(status_code=400, detail=f"Запись не найдена")
-                #raise e
+        await cls.check_category(wallet_id, data.category_id, session)
+        amount_minor = data.amount_minor()
+        try:
+            # Старые значения нужны, чтобы убрать сумму из агрегата. Читаются
+            # UPDATE без изменений: это уже запись, и блокировка берётся до чтения -
+            # строки в PostgreSQL, всей базы в SQLite (SELECT там транзакцию не открывает,
+            # а FOR UPDATE не поддерживается)
+            old = (await session.execute(
+                update(Operation)
+                .where(Operation.id == int(operation_id), Operation.wallet_id == wallet_id)
+                .values(id=Operation.id)
+                .returning(
+                    Operation.created_at, Operation.category_id,
+                    Operation.currency, Operation.amount_minor,
+                )
+                .execution_options(synchronize_session=False)
+            )).one()
+
+            new_data = data.model_dump()
+            # Смена валюты трогает остатки двух валют: блокировки - в одном порядке для всех
+            for currency in sorted({old.currency, new_data["currency"]}):
+                await lock_balances(session, wallet_id, currency)
+            updated = (await session.execute(
+                update(Operation)
+                .where(Operation.id == int(operation_id), Operation.wallet_id == wallet_id)
+                .values(
+                    category_id=new_data["category_id"],
+                    description=new_data["description"] or "",
+                    amount_minor=amount_minor,
+                    currency=new_data["currency"],
+                )
+                .returning(
+                    Operation.id, Operation.created_at, Operation.category_id,
+                    Operation.currency, Operation.amount_minor,
+                )
+                .execution_options(synchronize_session=False)
+            )).one()
+
+            await apply_delta(
+                session, wallet_id, old.created_at, old.category_id,
+                old.currency, -old.amount_minor, -1,
+            )
+            await apply_delta(
+                session, wallet_id, updated.created_at, updated.category_id,
+                updated.currency, updated.amount_minor, 1,
+            )
+            await session.commit()
+            analytics_cache.invalidate(wallet_id)
+            return updated.id
+        
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(status_code=400, detail=f"Запись не найдена")
 
     @classmethod
-    async def delete_one(cls, operation_id: int):
-        async with new_session() as session:
-            try:
-                operation_instance = await cls.get_one_operation(operation_id)
+    async def delete_one(cls, session: AsyncSession, wallet_id: int, operation_id: int):
+        try:
+            # DELETE ... RETURNING отдаёт удалённую строку для агрегата одним запросом
+            deleted = (await session.execute(
+                delete(Operation)
+                .where(Operation.id == int(operation_id), Operation.wallet_id == wallet_id)
+                .returning(
+                    Operation.created_at, Operation.category_id,
+                    Operation.currency, Operation.amount_minor,
+                )
+                .execution_options(synchronize_session=False)
+            )).one()
 
-                await session.delete(operation_instance)
-                await session.commit()
+            await apply_delta(
+                session, wallet_id, deleted.created_at, deleted.category_id,
+                deleted.currency, -deleted.amount_minor, -1,
+            )
+            await session.commit()
+            analytics_cache.invalidate(wallet_id)
 
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Запись не найдена")
\ No newline at end of file
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(status_code=400, detail=f"Запись не найдена")
@@ -1,9 +1,23 @@
+import csv
+import io
 from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 
+from app.categories.schemas import CategoryType
+from app.database import ReadSessionDep, SessionDep, WalletDep, wallet_sessionmakers
 from app.operations.repository import OperationsRepo
-from app.operations.schemas import OperationCreate, OperationGet, PeriodEnum
+from app.operations.writer import operation_writer
+from app.responses import FastJSONResponse
+from app.operations.schemas import (
+    ExportFormat,
+    OperationCreate,
+    OperationGet,
+    OperationSearch,
+    PageParams,
+    PeriodParams,
+)
 
 
 router = APIRouter(
@@ -12,45 +26,116 @@ router = APIRouter(
 )
 
 # List (by type for period) 
-@router.get("/", description="Список доходов \ расходов за период N")
-async def get_operations(data: Annotated[OperationGet, Depends()]):
-    # Вывод операций ( только доходов \ расходов) за период 1\7\31\365
+@router.get("/", description="Список доходов \ расходов за период")
+async def get_operations(
+    session: ReadSessionDep, wallet_id: WalletDep, data: Annotated[OperationGet, Depends()]
+):
+    # Вывод операций ( только доходов \ расходов) за период
     try:
-        operations = await OperationsRepo.get_operations(data)
-        return operations
+        operations = await OperationsRepo.get_operations(session, wallet_id, data)
+        return FastJSONResponse(operations)
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e.detail))
 
 
 # List (for the period)
-@router.get("/all/", description="Общий список операций за период N")
-async def get_all_operations(period: Optional[PeriodEnum] = None):
-    # Вывод ВСЕХ операций за период 1\7\31\365
+@router.get("/all/", description="Общий список операций за период")
+async def get_all_operations(
+    session: ReadSessionDep,
+    wallet_id: WalletDep,
+    page: Annotated[PageParams, Depends()],
+    period: Annotated[PeriodParams, Depends()],
+):
+    # Вывод ВСЕХ операций за период
     try:
-        operations = await OperationsRepo.get_all(period.value if period else None)
-        return operations
+        operations = await OperationsRepo.get_all(session, wallet_id, period, page)
+        return FastJSONResponse(operations)
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e.detail))
 
 
+# Search
+@router.get(
+    "/search/",
+    description="Поиск по описанию и имени категории: слова по началу, период и курсор как у списков",
+)
+async def search_operations(
+    session: ReadSessionDep, wallet_id: WalletDep, data: Annotated[OperationSearch, Depends()]
+):
+    try:
+        operations = await OperationsRepo.search(session, wallet_id, data)
+        return FastJSONResponse(operations)
+
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e.detail))
+
+
+# Export (stream)
+@router.get("/export/", description="Потоковая выгрузка операций за период в NDJSON или CSV")
+async def export_operations(
+    wallet_id: WalletDep,
+    period: Annotated[PeriodParams, Depends()],
+    format: ExportFormat = ExportFormat.ndjson,
+    type: Optional[CategoryType] = None,
+):
+    # Ошибки периода и кошелька - до StreamingResponse: после заголовков 200 их уже не отдать
+    start_date, end_date = period.resolve()
+    await wallet_sessionmakers(wallet_id)
+    media_type = "text/csv" if format == ExportFormat.csv else "application/x-ndjson"
+    return StreamingResponse(
+        OperationsRepo.export(wallet_id, start_date, end_date, type, format),
+        media_type=media_type,
+    )
+
+
 # Create one
 @router.post("/create/", description="Создать запись")
-async def create_operation(data: Annotated[OperationCreate, Depends()]) -> dict:
+async def create_operation(
+    session: SessionDep, wallet_id: WalletDep, data: Annotated[OperationCreate, Depends()]
+) -> dict:
     try:
-        new_op = await OperationsRepo.create_one(data)
-        return {"message": "Операция успешно записана", "id": new_op.id}
+        if operation_writer.running:
+            new_id = await OperationsRepo.enqueue_one(wallet_id, data)
+        else:
+            new_id = (await OperationsRepo.create_one(session, wallet_id, data)).id
+        return {"message": "Операция успешно записана", "id": new_id}
     
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e.detail))
 
+# Create many (JSON)
+@router.post("/bulk/", description="Пакетная загрузка записей списком JSON")
+async def create_operations_bulk(
+    session: SessionDep, wallet_id: WalletDep, rows: Annotated[list, Body()]
+) -> dict:
+    return await OperationsRepo.create_many(session, wallet_id, rows)
+
+
+# Create many (CSV)
+@router.post(
+    "/bulk/csv/",
+    description="Пакетная загрузка записей из CSV: amount, description, category_id, created_at",
+)
+async def create_operations_csv(session: SessionDep, wallet_id: WalletDep, file: UploadFile) -> dict:
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Файл должен быть в кодировке UTF-8")
+
+    rows = [
+        {key: value for key, value in row.items() if value not in (None, "")}
+        for row in csv.DictReader(io.StringIO(content))
+    ]
+    return await OperationsRepo.create_many(session, wallet_id, rows)
+
 # Retrive one
 @router.get("/{operation_id}/", description="Просмотреть запись по id")
-async def get_operation(operation_id: str):
+async def get_operation(session: ReadSessionDep, wallet_id: WalletDep, operation_id: str):
     try:
-        op_data = await OperationsRepo.get_one_operation(operation_id)
-        return op_data
+        op_data = await OperationsRepo.get_one_operation(session, wallet_id, operation_id)
+        return FastJSONResponse(op_data)
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -58,9 +143,13 @@ async def get_operation(operation_id: str):
 # Update one
 @router.patch("/{operation_id}/edit/", description="Изменить запись")
 async def update_operation(
-    operation_id: str, data: Annotated[OperationCreate, Depends()]):
+    session: SessionDep,
+    wallet_id: WalletDep,
+    operation_id: str,
+    data: Annotated[OperationCreate, Depends()],
+):
     try: 
-        upd_operation = await OperationsRepo.update_operation(operation_id, data)
+        upd_operation = await OperationsRepo.update_operation(session, wallet_id, operation_id, data)
         return {"message": "Запись успешно изменена:", "id": str(upd_operation)}
     
     except Exception as e:
@@ -68,9 +157,9 @@ async def update_operation(
 
 # Delete one
 @router.delete("/{operation_id}/delete/", description="Удалить запись")
-async def delete_operation(operation_id: str):
+async def delete_operation(session: SessionDep, wallet_id: WalletDep, operation_id: str):
     try:
-        await OperationsRepo.delete_one(operation_id)
+        await OperationsRepo.delete_one(session, wallet_id, operation_id)
         return {"message": "Запись успешно удалена"}
     except Exception as e:
         raise HTTPException(status_code=e.status_code, detail=str(e.detail))
@@ -1,15 +1,33 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
 from enum import Enum
 from typing import Optional
-from pydantic import BaseModel
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field
 
 from app.categories.schemas import CategoryType
+from app.config import settings
+from app.money import CURRENCY_PATTERN, from_minor, to_minor
 
 
 class OperationCreate(BaseModel):
-    amount: float
+    amount: Decimal
+    currency: str = Field(default=settings.default_currency, pattern=CURRENCY_PATTERN)
     description: Optional[str] = None
     category_id: int
 
+    def amount_minor(self) -> int:
+        try:
+            return to_minor(self.amount, self.currency)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+class OperationImport(OperationCreate):
+    # Строка пакетной загрузки (выписка банка): дата операции может быть в прошлом
+    created_at: Optional[date] = None
+
 
 class PeriodEnum(int, Enum):
     DAY = 1
@@ -17,6 +35,136 @@ class PeriodEnum(int, Enum):
     MONTH = 31
 
 
-class OperationGet(BaseModel):
-    type: CategoryType
+# Лёгкие строки ответа для списков: кортеж из базы -> dataclass со __slots__ -> orjson
+@dataclass(slots=True)
+class CategoryRow:
+    id: int
+    name: str
+    category_type: str
+
+
+@dataclass(slots=True)
+class OperationRow:
+    id: int
+    created_at: date
+    amount: Decimal
+    currency: str
+    description: str
+    category_id: int
+
+    @classmethod
+    def from_db(cls, row, *extra):
+        # В строке из базы сумма в минорных единицах: (id, created_at, amount_minor, currency, ...)
+        return cls(row[0], row[1], from_minor(row[2], row[3]), *row[3:], *extra)
+
+
+@dataclass(slots=True)
+class OperationWithCategoryRow(OperationRow):
+    category: CategoryRow
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class PageParams(BaseModel):
+    limit: int = Field(default=100, ge=1, le=1000)
+    after: Optional[str] = None
+
+
+class CalendarPeriod(str, Enum):
+    mtd = "mtd"  # С начала месяца
+    qtd = "qtd"  # С начала квартала
+    ytd = "ytd"  # С начала года
+
+
+DEFAULT_PERIOD_DAYS = 364
+# Конец периода (следующий день \ месяц \ год) должен помещаться в date: год не больше 9998
+MAX_YEAR = 9998
+
+
+class PeriodParams(BaseModel):
+    # Период выборки. Задаётся одним способом из:
+    # period - скользящие 1\7\31 день; calendar - mtd\qtd\ytd;
+    # month (2025-03), quarter (2025-Q1), year (2025); date_from\date_to (включительно).
+    # Без параметров - последние 364 дня.
     period: Optional[PeriodEnum] = None
+    calendar: Optional[CalendarPeriod] = None
+    month: Optional[str] = Field(default=None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$")
+    quarter: Optional[str] = Field(default=None, pattern=r"^\d{4}-Q[1-4]$")
+    year: Optional[int] = Field(default=None, ge=1, le=MAX_YEAR)
+    date_from: Optional[date] = None
+    date_to: Optional[date] = Field(default=None, le=date(MAX_YEAR, 12, 31))
+
+    def resolve(self, today: Optional[date] = None) -> tuple[date, date]:
+        # Полуинтервал [start, end): выборка ограничена с обеих сторон
+        selectors = [
+            self.period, self.calendar, self.month, self.quarter, self.year,
+            self.date_from or self.date_to,
+        ]
+        if sum(selector is not None for selector in selectors) > 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Период задаётся одним способом"
+            )
+
+        today = today or date.today()
+        tomorrow = today + timedelta(days=1)
+        if self.period is not None:
+            return today - timedelta(days=self.period.value), tomorrow
+        if self.calendar == CalendarPeriod.mtd:
+            return today.replace(day=1), tomorrow
+        if self.calendar == CalendarPeriod.qtd:
+            return quarter_start(today.year, (today.month - 1) // 3 + 1), tomorrow
+        if self.calendar == CalendarPeriod.ytd:
+            return date(today.year, 1, 1), tomorrow
+        if self.month is not None:
+            year, month = map(int, self.month.split("-"))
+            start = date(period_year(year), month, 1)
+            return start, add_months(start, 1)
+        if self.quarter is not None:
+            year, quarter = self.quarter.split("-Q")
+            start = quarter_start(period_year(int(year)), int(quarter))
+            return start, add_months(start, 3)
+        if self.year is not None:
+            return date(self.year, 1, 1), date(self.year + 1, 1, 1)
+        if self.date_from is not None or self.date_to is not None:
+            start = self.date_from or date.min
+            end = self.date_to + timedelta(days=1) if self.date_to else tomorrow
+            if start >= end:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="date_from позже date_to"
+                )
+            return start, end
+        return today - timedelta(days=DEFAULT_PERIOD_DAYS), tomorrow
+
+
+def period_year(year: int) -> int:
+    # month и quarter проверяются шаблоном, год в них - здесь, с той же границей, что у year
+    if not 1 <= year <= MAX_YEAR:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Год периода - от 1 до {MAX_YEAR}"
+        )
+    return year
+
+
+def quarter_start(year: int, quarter: int) -> date:
+    return date(year, (quarter - 1) * 3 + 1, 1)
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+class OperationGet(PageParams, PeriodParams):
+    type: CategoryType
+
+
+class OperationSearch(PageParams, PeriodParams):
+    # Слова ищутся по началу (кин -> кино, кинотеатр) в описании и имени категории,
+    # операция должна содержать все слова запроса
+    q: str = Field(min_length=1, max_length=200)
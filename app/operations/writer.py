@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+
+from app.analytics.cache import analytics_cache
+from app.analytics.rollup import apply_deltas
+from app.config import settings
+from app.database import Operation, wallet_session
+
+logger = logging.getLogger("app.write_behind")
+
+
+class WriteBehindQueue:
+    # Групповой коммит: create кладут строку в очередь и ждут id,
+    # единственный writer пишет накопившееся одной транзакцией.
+    # Ответ уходит только после коммита, так что подтверждённая запись уже в базе
+
+    def __init__(self, max_delay_ms: int, max_rows: int):
+        self.max_delay = max_delay_ms / 1000
+        self.max_rows = max_rows
+        self.batches = 0
+        self.rows = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Дописываем всё, что уже в очереди, и только потом выходим
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        await self._queue.put(None)
+        self._full.set()
+        await task
+
+        # Строки, попавшие в очередь уже после сигнала остановки
+        leftover = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                leftover.append(item)
+        if leftover:
+            await self._flush(leftover)
+
+    async def submit(self, row: dict) -> int:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        if self._queue.qsize() >= self.max_rows:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            # Ждём, пока наберётся пачка, но не дольше max_delay
+            if self._queue.qsize() < self.max_rows - 1:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = [first]
+            while len(batch) < self.max_rows and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]):
+        # В режиме файлов на кошелёк - своя транзакция на каждый файл,
+        # в общей базе вся пачка пишется одним коммитом
+        groups: dict[Optional[int], list[tuple[dict, asyncio.Future]]] = {}
+        for item in batch:
+            key = item[0]["wallet_id"] if settings.tenant_database_dir else None
+            groups.setdefault(key, []).append(item)
+        for items in groups.values():
+            await self._flush_group(items)
+
+    async def _flush_group(self, batch: list[tuple[dict, asyncio.Future]]):
+        rows = [row for row, _ in batch]
+        try:
+            ids = await self._write(rows)
+        except Exception as e:
+            if len(batch) > 1:
+                # Одна плохая строка (например, категорию только что удалили) не должна
+                # валить чужие: пачка переписывается по одной строке, ошибку получает только она
+                logger.warning("Пачка из %s операций не записана, пишем по одной", len(batch))
+                for item in batch:
+                    await self._flush_group([item])
+                return
+            logger.exception("Операция не записана")
+            _, future = batch[0]
+            if not future.done():
+                future.set_exception(e if isinstance(e, HTTPException) else HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Не удалось записать операцию",
+                ))
+            return
+
+        for wallet_id in {row["wallet_id"] for row in rows}:
+            analytics_cache.invalidate(wallet_id)
+        self.batches += 1
+        self.rows += len(rows)
+        for (_, future), operation_id in zip(batch, ids):
+            # Клиент мог отключиться, не дождавшись ответа
+            if not future.done():
+                future.set_result(operation_id)
+
+    async def _write(self, rows: list[dict]) -> list[int]:
+        async with wallet_session(rows[0]["wallet_id"]) as session:
+            ids = (await session.scalars(
+                insert(Operation).returning(Operation.id, sort_by_parameter_order=True),
+                rows,
+            )).all()
+            await apply_deltas(session, rows)
+            await session.commit()
+        return ids
+
+
+operation_writer = WriteBehindQueue(settings.write_behind_ms, settings.write_behind_rows)
@@ -0,0 +1,18 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def encode_decimal(value: Any):
+    # Деньги уходят в JSON строкой ("10.50"): через float теряются знаки и точность
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError
+
+
+class FastJSONResponse(JSONResponse):
+    # orjson сам сериализует dataclass, date и Enum - без jsonable_encoder
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=encode_decimal, option=orjson.OPT_NON_STR_KEYS)
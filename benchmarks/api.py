@@ -0,0 +1,222 @@
+"""Нагрузочный прогон роутов API (чтение, запись, пакетная загрузка, поиск, аналитика)
+через ASGI-клиент в том же процессе.
+
+Запуск из корня проекта (база должна быть заполнена benchmarks.seed):
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.api --requests 200 --concurrency 8
+Результат (p50/p95/p99 и запросов в секунду по каждому роуту) пишется в JSON;
+с --compare прошлый прогон сравнивается с текущим, регрессии отмечаются.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator
+
+RESULTS_DIR = Path(__file__).parent / "results"
+# Строк в одном запросе пакетной загрузки
+BULK_ROWS = 100
+# Категории сценария create удаляются после прогона
+BENCHMARK_CATEGORY = "benchmark"
+
+
+def scenarios(operation_id: int, category_id: int, deletable: Iterator[int]) -> dict:
+    # Имя -> (метод, путь, аргументы запроса). Путь и аргументы могут быть функциями:
+    # тогда они вызываются на каждый запрос (уникальное имя, следующий id на удаление)
+    bulk = [
+        {"amount": "10.50", "description": "benchmark bulk", "category_id": category_id}
+        for _ in range(BULK_ROWS)
+    ]
+    bulk_csv = "amount,description,category_id\n" + "".join(
+        f"10.50,benchmark csv,{category_id}\n" for _ in range(BULK_ROWS)
+    )
+    return {
+        "operations_by_type": ("GET", "/api/operations/", {"params": {"type": "expense", "limit": 100}}),
+        "operations_all": ("GET", "/api/operations/all/", {"params": {"limit": 100}}),
+        "operations_all_month": ("GET", "/api/operations/all/", {"params": {"period": 31, "limit": 1000}}),
+        "operations_search": ("GET", "/api/operations/search/", {"params": {"q": "операция 12", "limit": 100}}),
+        "operation_one": ("GET", f"/api/operations/{operation_id}/", {}),
+        "operations_export_day": ("GET", "/api/operations/export/", {"params": {"period": 1}}),
+        "operation_create": ("POST", "/api/operations/create/", {"params": {
+            "amount": 100, "description": "benchmark", "category_id": category_id,
+        }}),
+        "operation_edit": ("PATCH", f"/api/operations/{operation_id}/edit/", {"params": {
+            "amount": 100, "description": "benchmark edit", "category_id": category_id,
+        }}),
+        "operation_delete": ("DELETE", lambda: f"/api/operations/{next(deletable)}/delete/", {}),
+        "operations_bulk": ("POST", "/api/operations/bulk/", {"json": bulk}),
+        "operations_bulk_csv": ("POST", "/api/operations/bulk/csv/", {
+            "files": {"file": ("bulk.csv", bulk_csv, "text/csv")},
+        }),
+        "categories_by_type": ("GET", "/api/categories/", {"params": {"type": "expense"}}),
+        "categories_all": ("GET", "/api/categories/all/", {}),
+        "category_one": ("GET", f"/api/categories/{category_id}", {}),
+        "category_create": ("POST", "/api/categories/create/", lambda: {"params": {
+            "name": f"{BENCHMARK_CATEGORY} {uuid.uuid4().hex}", "category_type": "expense",
+        }}),
+        "analytics": ("GET", "/api/analytics/", {}),
+        "analytics_by_month": ("GET", "/api/analytics/", {"params": {"group_by": "month"}}),
+        "analytics_by_category": ("GET", "/api/analytics/categories/", {"params": {"types": "expense"}}),
+        "analytics_batch": ("GET", "/api/analytics/batch/", {"params": {"by_category": True}}),
+        "analytics_report": ("GET", "/api/analytics/report/", {"params": {"types": "expense"}}),
+        "balance": ("GET", "/api/analytics/balance/", {}),
+        "balance_series": ("GET", "/api/analytics/balance/series/", {"params": {"group_by": "month"}}),
+    }
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+async def measure(client, method: str, path, arguments, requests: int, concurrency: int) -> dict:
+    timings = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.request(
+                method,
+                path() if callable(path) else path,
+                **(arguments() if callable(arguments) else arguments),
+            )
+            await response.aread()
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "rps": round(requests / elapsed, 1),
+    }
+
+
+async def run(requests: int, concurrency: int, only: list[str]) -> dict:
+    import httpx
+    from sqlalchemy import delete, insert, select
+
+    from app.analytics.rollup import apply_deltas
+    from app.categories.cache import category_cache
+    from app.config import settings
+    from app.database import DEFAULT_WALLET_ID, Category, Operation, new_read_session, new_session
+    from main import app
+
+    # Клиент ходит без X-Wallet-Id, то есть в кошелёк по умолчанию
+    async with app.router.lifespan_context(app):
+        async with new_read_session() as session:
+            operation_id = await session.scalar(
+                select(Operation.id)
+                .where(Operation.wallet_id == DEFAULT_WALLET_ID)
+                .order_by(Operation.id.desc())
+                .limit(1)
+            )
+            category_id = await session.scalar(
+                select(Category.id)
+                .where(Category.wallet_id == DEFAULT_WALLET_ID, Category.category_type == "expense")
+                .limit(1)
+            )
+        if operation_id is None or category_id is None:
+            raise SystemExit("База пуста: сначала python -m benchmarks.seed")
+
+        # Сценарию удаления - по своей операции на запрос; вставка вместе с агрегатом,
+        # чтобы роут удаления вычитал из него то, что там есть
+        deletable = []
+        if not only or "operation_delete" in only:
+            rows = [
+                {
+                    "wallet_id": DEFAULT_WALLET_ID, "created_at": date.today(),
+                    "amount_minor": 100, "currency": settings.default_currency,
+                    "description": "benchmark delete", "category_id": category_id,
+                }
+                for _ in range(requests)
+            ]
+            async with new_session() as session:
+                deletable = (await session.scalars(insert(Operation).returning(Operation.id), rows)).all()
+                await apply_deltas(session, rows)
+                await session.commit()
+
+        transport = httpx.ASGITransport(app=app)
+        results = {}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, (method, path, arguments) in scenarios(operation_id, category_id, iter(deletable)).items():
+                if only and name not in only:
+                    continue
+                results[name] = await measure(client, method, path, arguments, requests, concurrency)
+                print(f"{name:24} {results[name]}")
+
+        # Категории сценария create пустые: их можно удалить без пересчёта агрегата
+        async with new_session() as session:
+            await session.execute(delete(Category).where(Category.name.like(f"{BENCHMARK_CATEGORY} %")))
+            await session.commit()
+        await category_cache.load()
+        return results
+
+
+def compare(previous: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, result in current["endpoints"].items():
+        before = previous["endpoints"].get(name)
+        if before is None:
+            continue
+        change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"]
+        mark = "РЕГРЕССИЯ" if change > threshold else ""
+        print(f"{name:24} p95 {before['p95_ms']:>9} -> {result['p95_ms']:>9} ms ({change:+.0%}) {mark}")
+        if mark:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="запросов на роут")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", nargs="*", default=[], help="имена сценариев")
+    parser.add_argument("--no-cache", action="store_true", help="отключить кэш ответов аналитики")
+    parser.add_argument("--output", type=Path, help="файл результата (по умолчанию benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="прошлый результат для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимый рост p95")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ["ANALYTICS_CACHE_SIZE"] = "0"
+
+    endpoints = asyncio.run(run(args.requests, args.concurrency, args.only))
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database_url": os.getenv("DATABASE_URL", "sqlite+aiosqlite:///finance.db"),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "analytics_cache": not args.no_cache,
+        "endpoints": endpoints,
+    }
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Результат: {output}")
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.threshold)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,99 @@
+"""Остаток на дату при растущей истории: контрольные точки против суммы по всей истории.
+
+Запуск из корня проекта: python -m benchmarks.balance --per-day 100 --years 1 2 4 8
+Каждая длина истории - отдельный кошелёк во временной базе, finance.db не затрагивается.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+# Временная база: настройки читаются при импорте app.database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+)
+
+from sqlalchemy import case, func, select
+
+from app.analytics.balances import balance_on, signed_totals
+from app.categories.cache import category_cache
+from app.config import settings
+from app.database import Category, DailyCategoryTotal, Operation, new_read_session
+from benchmarks.seed import seed
+
+
+def operations_query(wallet_id: int, day: date):
+    # Без агрегатов: знаковая сумма по всем операциям кошелька
+    signed = case(
+        (Category.category_type == "income", Operation.amount_minor),
+        else_=-Operation.amount_minor,
+    )
+    return (
+        select(func.sum(signed))
+        .join(Category, Category.id == Operation.category_id)
+        .where(
+            Operation.wallet_id == wallet_id,
+            Operation.currency == settings.default_currency,
+            Operation.created_at <= day,
+        )
+    )
+
+
+async def measure(query, repeat: int) -> tuple[float, int]:
+    timings = []
+    async with new_read_session() as session:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = await query(session)
+            timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3), result
+
+
+async def run(years: list[int], per_day: int, repeat: int) -> list[dict]:
+    today = date.today()
+    results = []
+    for wallet_id, wallet_years in enumerate(years, start=1):
+        await seed(
+            wallet_id, 50, per_day * 365 * wallet_years, wallet_years, False,
+            random.Random(wallet_id),
+        )
+    await category_cache.load()
+
+    for wallet_id, wallet_years in enumerate(years, start=1):
+        checkpoint_ms, checkpoint = await measure(
+            lambda session: balance_on(session, wallet_id, settings.default_currency, today), repeat
+        )
+        rollup_ms, rollup = await measure(
+            lambda session: session.scalar(
+                signed_totals(wallet_id, settings.default_currency)
+                .where(DailyCategoryTotal.day <= today)
+            ),
+            repeat,
+        )
+        operations_ms, operations = await measure(
+            lambda session: session.scalar(operations_query(wallet_id, today)), repeat
+        )
+        assert checkpoint == rollup == operations
+        results.append({
+            "years": wallet_years,
+            "operations": per_day * 365 * wallet_years,
+            "checkpoint_ms": checkpoint_ms,
+            "rollup_sum_ms": rollup_ms,
+            "operations_sum_ms": operations_ms,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--per-day", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for row in asyncio.run(run(args.years, args.per_day, args.repeat)):
+        print(row)
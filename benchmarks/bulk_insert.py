@@ -0,0 +1,68 @@
+"""Сравнение скорости загрузки: по одной записи через create_one и пачкой через create_many.
+
+Запуск из корня проекта: python -m benchmarks.bulk_insert --rows 2000
+База создаётся во временной папке, finance.db не затрагивается.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Временная база: настройки читаются при импорте app.database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+)
+
+from app.categories.schemas import CategoryType, CreateCategory
+from app.categories.repository import CategoryRepo
+from app.database import DEFAULT_WALLET_ID, new_session
+from app.migrations import upgrade
+from app.operations.repository import OperationsRepo
+from app.operations.schemas import OperationCreate
+
+
+async def run(rows: int) -> dict:
+    await upgrade()
+    async with new_session() as session:
+        category_id = await CategoryRepo.create_one(
+            session,
+            DEFAULT_WALLET_ID,
+            CreateCategory(category_type=CategoryType.expense, name="бенчмарк"),
+        )
+
+    started = time.perf_counter()
+    for number in range(rows):
+        # Как в API: своя сессия на каждый запрос
+        async with new_session() as session:
+            await OperationsRepo.create_one(
+                session,
+                DEFAULT_WALLET_ID,
+                OperationCreate(amount=number, description="single", category_id=category_id),
+            )
+    single = time.perf_counter() - started
+
+    payload = [
+        {"amount": number, "description": "bulk", "category_id": category_id}
+        for number in range(rows)
+    ]
+    started = time.perf_counter()
+    async with new_session() as session:
+        result = await OperationsRepo.create_many(session, DEFAULT_WALLET_ID, payload)
+    bulk = time.perf_counter() - started
+    assert result["created"] == rows and not result["errors"]
+
+    return {
+        "rows": rows,
+        "single_rows_per_sec": round(rows / single),
+        "bulk_rows_per_sec": round(rows / bulk),
+        "speedup": round(single / bulk, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(asyncio.run(run(args.rows)))
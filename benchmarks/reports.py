@@ -0,0 +1,138 @@
+"""Отчёт по категориям и месяцам за всю закрытую историю: сырые операции,
+дневной агрегат и снимки закрытых месяцев (.npz + numpy).
+
+Запуск из корня проекта: python -m benchmarks.reports --operations 1000000 --years 4
+База и снимки создаются во временной папке, finance.db не затрагивается.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+# Временная база и каталог снимков: настройки читаются при импорте app.database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+)
+os.environ.setdefault("SNAPSHOT_DIR", tempfile.mkdtemp())
+
+from sqlalchemy import func, select
+
+from app.analytics import snapshots
+from app.analytics.balances import month_start
+from app.analytics.functions import as_date, period_start
+from app.analytics.reports import build_report, month_range, monthly_totals
+from app.categories.cache import category_cache
+from app.categories.schemas import CategoryType
+from app.config import settings
+from app.database import DEFAULT_WALLET_ID, Operation, new_read_session
+from app.operations.schemas import add_months
+from benchmarks.seed import seed
+
+
+async def operations_totals(session, category_ids: list[int], start: date, end: date) -> dict:
+    # Без агрегатов: GROUP BY месяц и категория по всем операциям
+    bucket = period_start(Operation.created_at, "month")
+    rows = await session.execute(
+        select(bucket, Operation.category_id, func.sum(Operation.amount_minor))
+        .where(
+            Operation.wallet_id == DEFAULT_WALLET_ID,
+            Operation.category_id.in_(category_ids),
+            Operation.currency == settings.default_currency,
+            Operation.created_at >= start,
+            Operation.created_at < end,
+        )
+        .group_by(bucket, Operation.category_id)
+    )
+    totals = {}
+    for month, category_id, total in rows:
+        totals.setdefault(as_date(month), {})[category_id] = total
+    return totals
+
+
+async def measure(query, repeat: int, before=None) -> tuple[float, dict]:
+    timings = []
+    async with new_read_session() as session:
+        for _ in range(repeat):
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            result = await query(session)
+            timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2), result
+
+
+def size_mib(path: str) -> float:
+    total = sum(
+        os.path.getsize(os.path.join(folder, name))
+        for folder, _, names in os.walk(path) for name in names
+    ) if os.path.isdir(path) else os.path.getsize(path)
+    return round(total / 2**20, 2)
+
+
+async def run(operations: int, years: int, repeat: int) -> dict:
+    await seed(DEFAULT_WALLET_ID, 50, operations, years, False, random.Random(42))
+    await category_cache.load()
+
+    started = time.perf_counter()
+    await snapshots.export(DEFAULT_WALLET_ID)
+    export_s = round(time.perf_counter() - started, 2)
+
+    category_ids = [
+        category.id
+        for category in await category_cache.get_by_type(DEFAULT_WALLET_ID, CategoryType.expense)
+    ]
+    end = month_start(date.today())
+    start = add_months(end, -12 * years)
+
+    def totals(session):
+        return monthly_totals(
+            session, DEFAULT_WALLET_ID, settings.default_currency, category_ids, start, end
+        )
+
+    operations_ms, by_operations = await measure(
+        lambda session: operations_totals(session, category_ids, start, end), repeat
+    )
+    snapshot_dir = settings.snapshot_dir
+    object.__setattr__(settings, "snapshot_dir", None)
+    rollup_ms, by_rollup = await measure(totals, repeat)
+    object.__setattr__(settings, "snapshot_dir", snapshot_dir)
+    cold_ms, by_snapshots = await measure(totals, repeat, snapshots.frames.clear)
+    warm_ms, _ = await measure(totals, repeat)
+    assert by_operations == by_rollup == by_snapshots
+
+    months = month_range(start, end)
+    names = {category_id: str(category_id) for category_id in category_ids}
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build_report(by_snapshots, months, names, 5, settings.default_currency)
+        timings.append(time.perf_counter() - started)
+
+    return {
+        "operations": operations,
+        "months": len(months),
+        "export_s": export_s,
+        "operations_group_by_ms": operations_ms,
+        "rollup_group_by_ms": rollup_ms,
+        "snapshots_cold_ms": cold_ms,
+        "snapshots_warm_ms": warm_ms,
+        "build_report_ms": round(statistics.median(timings) * 1000, 2),
+        "database_mib": size_mib(settings.database_url.split("///", 1)[1]),
+        "snapshots_mib": size_mib(snapshot_dir),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=1_000_000)
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    if not snapshots.enabled():
+        raise SystemExit("Нужен numpy: pip install numpy")
+    print(asyncio.run(run(args.operations, args.years, args.repeat)))
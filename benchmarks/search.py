@@ -0,0 +1,142 @@
+"""Поиск операций: FTS5-индекс против LIKE по таблице и против выгрузки года через /all/.
+
+Запуск из корня проекта: python -m benchmarks.search --rows 1000000
+База создаётся во временной папке, finance.db не затрагивается.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Временная база: настройки читаются при импорте app.database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+)
+
+import orjson
+from sqlalchemy import func, insert, select
+
+from app.categories.cache import category_cache
+from app.config import settings
+from app.database import (
+    DEFAULT_WALLET_ID,
+    Category,
+    Operation,
+    engine,
+    new_read_session,
+)
+from app.migrations import upgrade
+from app.operations.repository import OPERATION_COLUMNS, OperationsRepo
+from app.operations.schemas import OperationSearch, PageParams, PeriodParams
+from app.responses import encode_decimal
+
+CHUNK_SIZE = 50_000
+WORDS = [
+    "продукты", "кино", "такси", "кафе", "аптека", "бензин", "подписка", "подарок",
+    "ремонт", "книги", "спортзал", "коммуналка", "связь", "одежда", "ресторан", "парковка",
+]
+# Частые слова (каждое в ~12% строк) и редкие сочетания со словом-номером
+QUERIES = ["кино", "подар", "такси кафе", "аптека 4242", "ремонт 77", "спортзал 9"]
+
+
+async def fill(rows: int, years: int, rng: random.Random):
+    await upgrade()
+    async with engine.begin() as conn:
+        await conn.execute(insert(Category), [
+            {"wallet_id": DEFAULT_WALLET_ID, "name": word, "category_type": "expense"}
+            for word in ("еда", "транспорт", "развлечения", "дом")
+        ])
+        category_ids = (await conn.execute(select(Category.id))).scalars().all()
+
+    today = date.today()
+    started = time.perf_counter()
+    for chunk_start in range(0, rows, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, rows - chunk_start)
+        async with engine.begin() as conn:
+            await conn.execute(insert(Operation), [
+                {
+                    "wallet_id": DEFAULT_WALLET_ID,
+                    "amount_minor": rng.randrange(50_00, 5000_00),
+                    "currency": settings.default_currency,
+                    "created_at": today - timedelta(days=rng.randrange(years * 365)),
+                    "description": " ".join(rng.sample(WORDS, 2)) + f" {rng.randrange(10_000)}",
+                    "category_id": rng.choice(category_ids),
+                }
+                for _ in range(size)
+            ])
+    return round(rows / (time.perf_counter() - started))
+
+
+async def measure(call, repeat: int) -> tuple[float, object]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await call()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2), result
+
+
+async def run(rows: int, years: int, repeat: int) -> dict:
+    insert_rate = await fill(rows, years, random.Random(42))
+    await category_cache.load()
+
+    results = {}
+    async with new_read_session() as session:
+        for text in QUERIES:
+            data = OperationSearch(q=text, limit=100)
+            fts_ms, found = await measure(lambda: OperationsRepo.search(session, DEFAULT_WALLET_ID, data), repeat)
+
+            start, end = data.resolve()
+            words = text.split()
+            like = select(*OPERATION_COLUMNS).where(
+                Operation.wallet_id == DEFAULT_WALLET_ID,
+                Operation.created_at >= start,
+                Operation.created_at < end,
+                *(Operation.description.like(f"%{word}%") for word in words),
+            ).order_by(Operation.created_at.desc(), Operation.id.desc()).limit(100)
+            like_ms, _ = await measure(lambda: session.execute(like), repeat)
+
+            total = await session.scalar(
+                select(func.count()).select_from(like.limit(None).order_by(None).subquery())
+            )
+            results[text] = {
+                "matches": total,
+                "fts_ms": fts_ms,
+                "like_ms": like_ms,
+                "page_bytes": len(orjson.dumps(found, default=encode_decimal)),
+            }
+
+        # Как сейчас ищут на клиенте: весь год постранично через /all/
+        async def full_listing():
+            size, after = 0, None
+            while True:
+                page = await OperationsRepo.get_all(
+                    session, DEFAULT_WALLET_ID, PeriodParams(), PageParams(limit=1000, after=after)
+                )
+                size += len(orjson.dumps(page, default=encode_decimal))
+                after = page["next_cursor"]
+                if after is None:
+                    return size
+
+        listing_ms, listing_bytes = await measure(full_listing, 1)
+
+    return {
+        "rows": rows,
+        "insert_rows_per_sec": insert_rate,
+        "queries": results,
+        "full_year_listing": {"ms": listing_ms, "bytes": listing_bytes},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(orjson.dumps(asyncio.run(run(args.rows, args.years, args.repeat)), option=orjson.OPT_INDENT_2).decode())
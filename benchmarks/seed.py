@@ -0,0 +1,89 @@
+"""Синтетический журнал операций для нагрузочных тестов.
+
+Запуск из корня проекта:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.seed --categories 50 --operations 10000000 --years 5
+Пишет в базу из DATABASE_URL (по умолчанию finance.db), в кошелёк --wallet,
+и отказывается дописывать в непустой кошелёк без --append.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app.analytics.rollup import rebuild
+from app.config import settings
+from app.database import DEFAULT_WALLET_ID, Category, Operation, engine
+from app.migrations import upgrade
+
+CHUNK_SIZE = 50_000
+INCOME_SHARE = 0.2  # Доля категорий доходов
+
+
+async def seed(
+    wallet_id: int, categories: int, operations: int, years: int, append: bool, rng: random.Random
+):
+    await upgrade()
+    async with engine.begin() as conn:
+        existing = await conn.scalar(
+            select(func.count(Operation.id)).where(Operation.wallet_id == wallet_id)
+        )
+        if existing and not append:
+            raise SystemExit(f"В базе уже {existing} операций, используйте --append")
+
+        offset = await conn.scalar(select(func.count(Category.id))) or 0
+        incomes = max(1, int(categories * INCOME_SHARE))
+        await conn.execute(insert(Category), [
+            {
+                "wallet_id": wallet_id,
+                "name": f"категория {offset + number}",
+                "category_type": "income" if number < incomes else "expense",
+            }
+            for number in range(categories)
+        ])
+        category_ids = (await conn.execute(
+            select(Category.id).where(Category.wallet_id == wallet_id)
+        )).scalars().all()
+
+    today = date.today()
+    days = years * 365
+    started = time.perf_counter()
+    for chunk_start in range(0, operations, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, operations - chunk_start)
+        rows = [
+            {
+                "wallet_id": wallet_id,
+                "amount_minor": rng.randrange(50_00, 5000_00),
+                "currency": settings.default_currency,
+                "created_at": today - timedelta(days=rng.randrange(days)),
+                "description": f"операция {chunk_start + number}",
+                "category_id": rng.choice(category_ids),
+            }
+            for number in range(size)
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(Operation), rows)
+        done = chunk_start + size
+        rate = done / (time.perf_counter() - started)
+        print(f"\r{done}/{operations} операций, {rate:,.0f} строк/с", end="", flush=True)
+    print()
+
+    print(f"Агрегат пересобран, строк: {await rebuild(wallet_id)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wallet", type=int, default=DEFAULT_WALLET_ID)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--operations", type=int, default=100_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--append", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(seed(
+        args.wallet, args.categories, args.operations, args.years, args.append,
+        random.Random(args.seed),
+    ))
@@ -0,0 +1,119 @@
+"""Стоимость сериализации списка операций: ORM-объекты + selectinload + jsonable_encoder
+против кортежей Core -> dataclass со __slots__ -> orjson.
+
+Запуск из корня проекта: python -m benchmarks.serialization --rows 1000
+Считает время выборки и сериализации, блоки памяти на строку (tracemalloc)
+и размер ответа.
+База создаётся во временной папке, finance.db не затрагивается.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+# Временная база: настройки читаются при импорте app.database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.categories.repository import CategoryRepo
+from app.categories.schemas import CategoryType, CreateCategory
+from app.database import DEFAULT_WALLET_ID, Operation, new_read_session, new_session
+from app.migrations import upgrade
+from app.operations.repository import OperationsRepo
+from app.operations.schemas import PageParams, PeriodParams
+from app.responses import FastJSONResponse
+
+
+async def legacy_fetch(rows: int):
+    async with new_read_session() as session:
+        query = (
+            select(Operation)
+            .options(selectinload(Operation.category))
+            .order_by(Operation.created_at.desc(), Operation.id.desc())
+            .limit(rows)
+        )
+        return (await session.execute(query)).scalars().all()
+
+
+def legacy_encode(operations) -> bytes:
+    return JSONResponse(jsonable_encoder(operations)).body
+
+
+async def lean_fetch(rows: int):
+    async with new_read_session() as session:
+        return await OperationsRepo.get_all(
+            session, DEFAULT_WALLET_ID, PeriodParams(), PageParams(limit=rows)
+        )
+
+
+def lean_encode(page) -> bytes:
+    return FastJSONResponse(page).body
+
+
+async def measure(fetch, encode, rows: int, repeat: int) -> dict:
+    encode(await fetch(rows))  # Прогрев: кэши SQLAlchemy, соединения
+
+    fetch_time = encode_time = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fetch(rows)
+        fetched = time.perf_counter()
+        body = encode(result)
+        fetch_time += fetched - started
+        encode_time += time.perf_counter() - fetched
+
+    # Блоки памяти, которые занимает выборка, пока она держится до сериализации
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = await fetch(rows)
+    after = tracemalloc.take_snapshot()
+    encode(result)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+    return {
+        "fetch_ms": round(fetch_time / repeat * 1000, 2),
+        "encode_ms": round(encode_time / repeat * 1000, 2),
+        "blocks_per_row": round(blocks / rows, 1),
+        "peak_bytes_per_row": round(peak / rows),
+        "bytes_per_response": len(body),
+    }
+
+
+async def run(rows: int, repeat: int) -> dict:
+    await upgrade()
+    async with new_session() as session:
+        category_id = await CategoryRepo.create_one(
+            session,
+            DEFAULT_WALLET_ID,
+            CreateCategory(category_type=CategoryType.expense, name="бенчмарк"),
+        )
+    async with new_session() as session:
+        await OperationsRepo.create_many(session, DEFAULT_WALLET_ID, [
+            {"amount": number + 0.5, "description": f"операция {number}", "category_id": category_id}
+            for number in range(rows)
+        ])
+
+    return {
+        "rows": rows,
+        "legacy": await measure(legacy_fetch, legacy_encode, rows, repeat),
+        "lean": await measure(lean_fetch, lean_encode, rows, repeat),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(asyncio.run(run(args.rows, args.repeat)))
@@ -0,0 +1,125 @@
+"""Задержка update/delete: прежняя схема (чтение в отдельной сессии + повторное
+присоединение объекта) против одной сессии на запрос и UPDATE/DELETE ... RETURNING.
+
+Запуск из корня проекта: python -m benchmarks.session_overhead --rows 500
+База создаётся во временной папке, finance.db не затрагивается.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# Временная база: настройки читаются при импорте app.database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+)
+
+from sqlalchemy import select
+
+from app.analytics.rollup import apply_delta
+from app.categories.repository import CategoryRepo
+from app.categories.schemas import CategoryType, CreateCategory
+from app.database import DEFAULT_WALLET_ID, Operation, new_read_session, new_session
+from app.migrations import upgrade
+from app.operations.repository import OperationsRepo
+from app.operations.schemas import OperationCreate
+
+
+async def legacy_get(operation_id: int) -> Operation:
+    async with new_read_session() as session:
+        response = await session.execute(select(Operation).where(Operation.id == operation_id))
+        return response.scalar_one()
+
+
+async def legacy_update(operation_id: int, data: OperationCreate):
+    async with new_session() as session:
+        operation = await legacy_get(operation_id)
+        await apply_delta(
+            session, operation.wallet_id, operation.created_at, operation.category_id,
+            operation.currency, -operation.amount_minor, -1,
+        )
+        operation.amount_minor = data.amount_minor()
+        operation.currency = data.currency
+        operation.description = data.description
+        operation.category_id = data.category_id
+        session.add(operation)
+        await apply_delta(
+            session, operation.wallet_id, operation.created_at, operation.category_id,
+            operation.currency, operation.amount_minor, 1,
+        )
+        await session.commit()
+        await session.flush()
+
+
+async def legacy_delete(operation_id: int):
+    async with new_session() as session:
+        operation = await legacy_get(operation_id)
+        await apply_delta(
+            session, operation.wallet_id, operation.created_at, operation.category_id,
+            operation.currency, -operation.amount_minor, -1,
+        )
+        await session.delete(operation)
+        await session.commit()
+
+
+async def current_update(operation_id: int, data: OperationCreate):
+    async with new_session() as session:
+        await OperationsRepo.update_operation(session, DEFAULT_WALLET_ID, operation_id, data)
+
+
+async def current_delete(operation_id: int):
+    async with new_session() as session:
+        await OperationsRepo.delete_one(session, DEFAULT_WALLET_ID, operation_id)
+
+
+async def measure(func, ids, *args) -> dict:
+    timings = []
+    for operation_id in ids:
+        started = time.perf_counter()
+        await func(operation_id, *args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(statistics.median(timings), 3),
+    }
+
+
+async def run(rows: int) -> dict:
+    await upgrade()
+    async with new_session() as session:
+        category_id = await CategoryRepo.create_one(
+            session,
+            DEFAULT_WALLET_ID,
+            CreateCategory(category_type=CategoryType.expense, name="бенчмарк"),
+        )
+    async with new_session() as session:
+        await OperationsRepo.create_many(session, DEFAULT_WALLET_ID, [
+            {"amount": number, "description": "bench", "category_id": category_id}
+            for number in range(rows * 2)
+        ])
+
+    data = OperationCreate(amount=1, description="updated", category_id=category_id)
+    legacy_ids = range(1, rows + 1)
+    current_ids = range(rows + 1, rows * 2 + 1)
+
+    return {
+        "rows": rows,
+        "update": {
+            "legacy": await measure(legacy_update, legacy_ids, data),
+            "current": await measure(current_update, current_ids, data),
+        },
+        "delete": {
+            "legacy": await measure(legacy_delete, legacy_ids),
+            "current": await measure(current_delete, current_ids),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+
+    print(asyncio.run(run(args.rows)))
@@ -0,0 +1,68 @@
+"""Старт воркера: прежняя подготовка схемы (create_all, индексы, поиск, проверка агрегата)
+против сверки версии схемы одним запросом.
+
+Запуск из корня проекта: python -m benchmarks.startup --operations 100000 --repeat 20
+База создаётся во временной папке, finance.db не затрагивается.
+Каждый замер - с новым движком, как у только что запущенного воркера.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+# Временная база: настройки читаются при импорте app.database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+)
+
+from app.config import settings
+from app.database import DEFAULT_WALLET_ID, make_engine
+from app.migrations import check_schema
+from app.migrations.versions import MIGRATIONS
+from benchmarks.seed import seed
+
+
+async def prepare_every_boot(target):
+    # Как lifespan до версий: все проверки схемы и агрегата на каждом старте
+    for _, _, step in MIGRATIONS:
+        async with target.begin() as conn:
+            await step(conn, DEFAULT_WALLET_ID)
+
+
+async def measure(prepare, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        target = make_engine(settings.database_url, settings.pool_size)
+        started = time.perf_counter()
+        await prepare(target)
+        timings.append(time.perf_counter() - started)
+        await target.dispose()
+    return {
+        "p50_ms": round(statistics.median(timings) * 1000, 2),
+        "max_ms": round(max(timings) * 1000, 2),
+    }
+
+
+async def run(operations: int, repeat: int) -> dict:
+    await seed(DEFAULT_WALLET_ID, 50, operations, 3, False, random.Random(42))
+
+    every_boot = await measure(prepare_every_boot, repeat)
+    version_check = await measure(check_schema, repeat)
+    return {
+        "operations": operations,
+        "create_all_every_boot": every_boot,
+        "schema_version_check": version_check,
+        "speedup": round(every_boot["p50_ms"] / version_check["p50_ms"], 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(asyncio.run(run(args.operations, args.repeat)))
@@ -0,0 +1,97 @@
+"""Конкурентные create: коммит на каждую операцию против очереди записи (WRITE_BEHIND).
+
+Запуск из корня проекта: python -m benchmarks.write_behind --rows 2000 --concurrency 50
+База создаётся во временной папке, finance.db не затрагивается.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# Временная база: настройки читаются при импорте app.database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+)
+
+from app.categories.cache import category_cache
+from app.categories.repository import CategoryRepo
+from app.categories.schemas import CategoryType, CreateCategory
+from app.database import DEFAULT_WALLET_ID, new_session
+from app.migrations import upgrade
+from app.operations.repository import OperationsRepo
+from app.operations.schemas import OperationCreate
+from app.operations.writer import operation_writer
+
+
+async def direct_create(data: OperationCreate):
+    # Как в API без очереди: своя сессия и свой коммит на каждый запрос
+    async with new_session() as session:
+        await OperationsRepo.create_one(session, DEFAULT_WALLET_ID, data)
+
+
+async def queued_create(data: OperationCreate):
+    await OperationsRepo.enqueue_one(DEFAULT_WALLET_ID, data)
+
+
+async def load(create, rows: int, concurrency: int, category_id: int) -> dict:
+    latencies = []
+    numbers = iter(range(rows))
+
+    async def client():
+        for number in numbers:
+            data = OperationCreate(amount=number, description="bench", category_id=category_id)
+            started = time.perf_counter()
+            await create(data)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rows_per_sec": round(rows / elapsed),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+async def run(rows: int, concurrency: int) -> dict:
+    await upgrade()
+    await category_cache.load()
+    async with new_session() as session:
+        category_id = await CategoryRepo.create_one(
+            session,
+            DEFAULT_WALLET_ID,
+            CreateCategory(category_type=CategoryType.expense, name="бенчмарк"),
+        )
+
+    direct = await load(direct_create, rows, concurrency, category_id)
+    direct["commits_per_sec"] = direct["rows_per_sec"]
+
+    await operation_writer.start()
+    queued = await load(queued_create, rows, concurrency, category_id)
+    await operation_writer.stop()
+    queued["commits"] = operation_writer.batches
+    queued["commits_per_sec"] = round(operation_writer.batches / queued["elapsed_s"])
+    queued["rows_per_commit"] = round(operation_writer.rows / operation_writer.batches, 1)
+
+    return {
+        "rows": rows,
+        "concurrency": concurrency,
+        "direct": direct,
+        "write_behind": queued,
+        "speedup": round(queued["rows_per_sec"] / direct["rows_per_sec"], 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    print(asyncio.run(run(args.rows, args.concurrency)))
@@ -2,21 +2,35 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from app.database import create_tables
+from app.categories.cache import category_cache
+from app.config import settings
+from app.database import dispose_tenants
+from app.migrations import check_schema
 from app.categories.router import router as category_router
 from app.operations.router import router as operation_router
 from app.analytics.router import router as analytics_router
+from app.metrics import metrics_middleware, router as metrics_router
+from app.operations.writer import operation_writer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await create_tables()
+    # Схему меняет python -m app.migrations upgrade до запуска, здесь только сверка версии
+    await check_schema()
+    if settings.tenant_database_dir is None:
+        await category_cache.load()
+    if settings.write_behind:
+        await operation_writer.start()
     print("Включение")
     print("База данных готова к работе")
     yield
+    # Очередь записи дописывается до закрытия приложения
+    await operation_writer.stop()
+    await dispose_tenants()
     print("Выключение")
     
 app = FastAPI(lifespan=lifespan)
+app.middleware("http")(metrics_middleware)
 
 
 @app.get("/")
@@ -27,6 +41,7 @@ async def index():
 app.include_router(category_router)
 app.include_router(operation_router)
 app.include_router(analytics_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,47 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batch_keeps_categories_with_zero_total(client, categories):
+    # Покупка и возврат за сегодня: итог ноль, но категория в разбивке остаётся
+    food = categories["еда"]
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "250", "category_id": food},
+        {"amount": "-250", "category_id": food},
+    ])
+    assert response.json() == {"created": 2, "errors": []}
+
+    response = await client.get(
+        "/api/analytics/batch/",
+        params={"periods": ["day", "mtd"], "types": ["income", "expense"], "by_category": True},
+    )
+    assert response.status_code == 200, response.text
+    for period in response.json()["periods"].values():
+        assert period["expense"] == "0.00"
+        assert period["categories"] == {
+            "income": [],
+            "expense": [{"category": "еда", "total_amount": "0.00"}],
+        }
+
+
+async def test_report_with_zero_total_and_open_start(client, categories):
+    pytest.importorskip("numpy")
+    response = await client.post("/api/categories/create/", params={"name": "кафе", "category_type": "expense"})
+    assert response.status_code == 200, response.text
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "250", "category_id": categories["еда"], "created_at": "2026-02-10"},
+        {"amount": "-250", "category_id": int(response.json()["id"]), "created_at": "2026-03-10"},
+    ])
+    assert response.json() == {"created": 2, "errors": []}
+
+    # Итог по категориям - ноль, а период начинается с 0001-01-01: месяцы - с первого с данными
+    response = await client.get(
+        "/api/analytics/report/",
+        params={"types": "expense", "date_from": "0001-01-01", "date_to": "2026-03-31"},
+    )
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["total"] == "0.00"
+    assert [month["month"] for month in report["months"]] == ["2026-02-01", "2026-03-01"]
+    assert {category["share"] for category in report["categories"]} == {None}
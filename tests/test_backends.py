@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import Date, literal, select, text
+from sqlalchemy.exc import DBAPIError
+
+from app.analytics.functions import as_date, period_start
+from app.analytics.rollup import apply_rollup_delta
+from app.database import Category, DailyCategoryTotal, new_read_session, new_session
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize(
+    ("day", "unit", "expected"),
+    [
+        (date(2026, 3, 18), "day", date(2026, 3, 18)),
+        (date(2026, 3, 18), "week", date(2026, 3, 16)),  # среда -> понедельник
+        (date(2026, 3, 16), "week", date(2026, 3, 16)),  # понедельник остаётся собой
+        (date(2026, 3, 22), "week", date(2026, 3, 16)),  # воскресенье - та же неделя
+        (date(2026, 1, 1), "week", date(2025, 12, 29)),  # неделя через границу года
+        (date(2026, 3, 18), "month", date(2026, 3, 1)),
+        (date(2026, 3, 1), "month", date(2026, 3, 1)),
+    ],
+)
+async def test_period_start(database, day, unit, expected):
+    async with new_read_session() as session:
+        result = await session.scalar(select(period_start(literal(day, Date), unit)))
+    assert as_date(result) == expected
+
+
+async def add_category(session, name: str = "еда", category_type: str = "expense") -> int:
+    category = Category(wallet_id=1, name=name, category_type=category_type)
+    session.add(category)
+    await session.flush()
+    return category.id
+
+
+async def daily_totals(session) -> list[tuple]:
+    return (await session.execute(
+        select(DailyCategoryTotal.day, DailyCategoryTotal.total_minor, DailyCategoryTotal.count)
+        .order_by(DailyCategoryTotal.day)
+    )).all()
+
+
+async def test_upsert_adds_to_existing_row(database):
+    day = date(2026, 3, 18)
+    async with new_session() as session:
+        category_id = await add_category(session)
+        await apply_rollup_delta(session, 1, day, category_id, "RUB", 1000, 1)
+        await apply_rollup_delta(session, 1, day, category_id, "RUB", 250, 1)
+        await apply_rollup_delta(session, 1, date(2026, 3, 19), category_id, "RUB", 5, 1)
+        await session.commit()
+        assert await daily_totals(session) == [(day, 1250, 2), (date(2026, 3, 19), 5, 1)]
+
+        # Последняя операция дня ушла - строка агрегата удаляется
+        await apply_rollup_delta(session, 1, date(2026, 3, 19), category_id, "RUB", -5, -1)
+        await session.commit()
+        assert await daily_totals(session) == [(day, 1250, 2)]
+
+
+async def test_category_type_enum(database):
+    async with new_session() as session:
+        for category_type in ("income", "expense"):
+            await add_category(session, category_type, category_type)
+        await session.commit()
+        types = (await session.scalars(select(Category.category_type).order_by(Category.id))).all()
+        assert [getattr(value, "value", value) for value in types] == ["income", "expense"]
+
+        if session.get_bind().dialect.name == "postgresql":
+            # Нативный именованный ENUM, чужое значение не пройдёт
+            labels = (await session.scalars(text(
+                "SELECT e.enumlabel FROM pg_enum e JOIN pg_type t ON t.oid = e.enumtypid "
+                "WHERE t.typname = 'category_type' ORDER BY e.enumsortorder"
+            ))).all()
+            assert labels == ["income", "expense"]
+            with pytest.raises(DBAPIError):
+                await session.execute(text(
+                    "INSERT INTO categories (wallet_id, name, category_type) VALUES (1, 'x', 'other')"
+                ))
+
+
+async def test_read_engine_rejects_writes(database):
+    # SQLite - PRAGMA query_only, PostgreSQL - default_transaction_read_only
+    async with new_read_session() as session:
+        with pytest.raises(DBAPIError):
+            await session.execute(text(
+                "INSERT INTO categories (wallet_id, name, category_type) VALUES (1, 'x', 'income')"
+            ))
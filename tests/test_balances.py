@@ -0,0 +1,141 @@
+import asyncio
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import case, func, select
+
+from app.analytics.balances import apply_balance_delta
+from app.analytics.rollup import verify
+from app.database import Category, MonthlyBalance, Operation, new_read_session, new_session
+
+pytestmark = pytest.mark.anyio
+
+DAYS = (date(2025, 11, 30), date(2026, 1, 15), date(2026, 2, 1), date(2026, 3, 31), date.today())
+
+
+async def operations_balance(day: date) -> int:
+    # Эталон: знаковая сумма всех операций до дня включительно
+    signed = case(
+        (Category.category_type == "income", Operation.amount_minor),
+        else_=-Operation.amount_minor,
+    )
+    async with new_read_session() as session:
+        return await session.scalar(
+            select(func.coalesce(func.sum(signed), 0))
+            .join(Category, Category.id == Operation.category_id)
+            .where(Operation.wallet_id == 1, Operation.currency == "RUB", Operation.created_at <= day)
+        )
+
+
+async def assert_balances(client):
+    # Контрольная точка + хвост месяца совпадает с суммой по операциям, чекпойнты - с пересчётом
+    assert await verify(1) == []
+    for day in DAYS:
+        response = await client.get("/api/analytics/balance/", params={"on": day.isoformat()})
+        assert response.status_code == 200, response.text
+        assert Decimal(response.json()["balance"]) * 100 == await operations_balance(day), day
+
+
+async def test_balance_after_create_update_delete(client, categories):
+    salary, food = categories["зарплата"], categories["еда"]
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "1000", "category_id": salary, "created_at": "2025-12-05"},
+        {"amount": "120.50", "category_id": food, "created_at": "2025-12-20"},
+        {"amount": "300", "category_id": food, "created_at": "2026-02-10"},
+        {"amount": "2000", "category_id": salary, "created_at": "2026-03-01"},
+    ])
+    assert response.json() == {"created": 4, "errors": []}
+    await assert_balances(client)
+
+    response = await client.post(
+        "/api/operations/create/", params={"amount": "75", "description": "обед", "category_id": food}
+    )
+    assert response.status_code == 200, response.text
+    created_id = response.json()["id"]
+    await assert_balances(client)
+
+    async with new_read_session() as session:
+        february_id = await session.scalar(
+            select(Operation.id).where(Operation.created_at == date(2026, 2, 10))
+        )
+    # Расход стал доходом и изменил сумму: меняются знак и движение месяца
+    response = await client.patch(
+        f"/api/operations/{february_id}/edit/",
+        params={"amount": "450", "description": "возврат", "category_id": salary},
+    )
+    assert response.status_code == 200, response.text
+    await assert_balances(client)
+
+    for operation_id in (created_id, february_id):
+        response = await client.delete(f"/api/operations/{operation_id}/delete/")
+        assert response.status_code == 200, response.text
+        await assert_balances(client)
+
+
+async def test_concurrent_deltas_keep_checkpoints(database):
+    # Новая строка февраля не должна взять остаток января до коммита параллельной дельты января
+    async with new_session() as session:
+        await apply_balance_delta(session, 1, "RUB", date(2026, 1, 10), 100)
+        await session.commit()
+
+    async def february():
+        async with new_session() as session:
+            await apply_balance_delta(session, 1, "RUB", date(2026, 2, 10), 10)
+            await session.commit()
+
+    async with new_session() as january:
+        await apply_balance_delta(january, 1, "RUB", date(2026, 1, 20), 50)
+        task = asyncio.create_task(february())
+        await asyncio.sleep(0.3)
+        assert not task.done()  # февраль ждёт, пока январь не закоммитится
+        await january.commit()
+    await task
+
+    async with new_read_session() as session:
+        rows = (await session.execute(
+            select(MonthlyBalance.month, MonthlyBalance.net_minor, MonthlyBalance.closing_minor)
+            .order_by(MonthlyBalance.month)
+        )).all()
+    assert [tuple(row) for row in rows] == [(date(2026, 1, 1), 150, 150), (date(2026, 2, 1), 10, 160)]
+
+
+async def test_concurrent_updates_keep_rollup(client, categories):
+    # Параллельные правки одной операции: старые значения каждой читаются под блокировкой записи
+    salary, food = categories["зарплата"], categories["еда"]
+    response = await client.post(
+        "/api/operations/create/", params={"amount": "100", "description": "обед", "category_id": food}
+    )
+    operation_id = response.json()["id"]
+
+    async def edit(number: int):
+        response = await client.patch(
+            f"/api/operations/{operation_id}/edit/",
+            params={
+                "amount": str(number + 1),
+                "description": "правка",
+                "category_id": salary if number % 2 else food,
+            },
+        )
+        assert response.status_code == 200, response.text
+
+    await asyncio.gather(*(edit(number) for number in range(20)))
+    await assert_balances(client)
+
+
+async def test_balance_series_from_first_day(client, categories):
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "1000", "category_id": categories["зарплата"], "created_at": "2025-12-05"},
+        {"amount": "300", "category_id": categories["еда"], "created_at": "2026-02-10"},
+    ])
+    assert response.json() == {"created": 2, "errors": []}
+
+    # Периоды без движения не выводятся: январь пропущен
+    expected = [
+        {"period": "2025-12-01", "balance": "1000.00"},
+        {"period": "2026-02-01", "balance": "700.00"},
+    ]
+    for params in ({"date_to": "2026-02-28"}, {"date_from": "0001-01-01", "date_to": "2026-02-28"}):
+        response = await client.get("/api/analytics/balance/series/", params=params)
+        assert response.status_code == 200, response.text
+        assert response.json()["series"] == expected
@@ -0,0 +1,34 @@
+import time
+
+import pytest
+from sqlalchemy import update
+
+from app.categories.cache import category_cache
+from app.config import settings
+from app.database import DEFAULT_WALLET_ID, Category, new_session
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_edit_with_bad_id_is_400(client, categories):
+    response = await client.patch(
+        "/api/categories/abc/edit/", params={"name": "еда", "category_type": "expense"}
+    )
+    assert response.status_code == 400, response.text
+
+
+async def test_rename_in_other_process_seen_after_ttl(client, categories):
+    async with new_session() as session:
+        await session.execute(
+            update(Category).where(Category.id == categories["еда"]).values(name="продукты")
+        )
+        await session.commit()
+
+    # В пределах CATEGORY_CACHE_TTL - из памяти, без запроса к базе
+    response = await client.get("/api/categories/all/")
+    assert "еда" in response.text
+    assert response.headers["X-DB-Statements"] == "0"
+
+    category_cache.loaded_at[DEFAULT_WALLET_ID] = time.monotonic() - settings.category_cache_ttl
+    response = await client.get("/api/categories/all/")
+    assert "продукты" in response.text and "еда" not in response.text
@@ -0,0 +1,37 @@
+import pytest
+
+from app.metrics import endpoints
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_streaming_export_counts_db_time(client, categories):
+    response = await client.post(
+        "/api/operations/create/",
+        params={"amount": "10.50", "category_id": categories["еда"], "description": "обед"},
+    )
+    assert response.status_code == 200
+
+    # Выгрузка читает базу, пока отдаётся тело: запросы должны попасть в метрики эндпоинта
+    endpoint = endpoints[("GET", "/api/operations/export/", 200)]
+    requests, statements = endpoint.requests, endpoint.statements
+    response = await client.get("/api/operations/export/")
+    assert response.status_code == 200
+    assert "обед" in response.text
+    assert endpoint.requests == requests + 1
+    assert endpoint.statements > statements
+
+
+async def test_rows_counted_for_reads(client, categories):
+    food = categories["еда"]
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": str(number + 1), "category_id": food} for number in range(3)
+    ])
+    assert response.json() == {"created": 3, "errors": []}
+
+    # На SQLite rowcount у SELECT всегда -1: строки считаются на уровне результата
+    endpoint = endpoints[("GET", "/api/operations/all/", 200)]
+    rows = endpoint.rows
+    response = await client.get("/api/operations/all/")
+    assert len(response.json()["items"]) == 3
+    assert endpoint.rows == rows + 3
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import inspect
+
+from app.database import Model
+from app.migrations import LATEST_VERSION, current_version, upgrade
+
+pytestmark = pytest.mark.anyio
+
+
+def describe_schema(conn) -> dict:
+    # Таблицы моделей, как их видит база: колонки, индексы, уникальные ключи и внешние ключи
+    inspector = inspect(conn)
+    schema = {}
+    for name in Model.metadata.tables:
+        schema[name] = {
+            "columns": sorted(
+                (item["name"], str(item["type"]), item["nullable"]) for item in inspector.get_columns(name)
+            ),
+            "indexes": sorted(
+                (item["name"], tuple(item["column_names"]), bool(item["unique"]))
+                for item in inspector.get_indexes(name)
+                if not (item["name"] or "").startswith("sqlite_autoindex")
+            ),
+            "unique": sorted(
+                (item["name"], tuple(item["column_names"])) for item in inspector.get_unique_constraints(name)
+            ),
+            "foreign_keys": sorted(
+                (tuple(item["constrained_columns"]), item["referred_table"], tuple(item["referred_columns"]))
+                for item in inspector.get_foreign_keys(name)
+            ),
+        }
+    return schema
+
+
+async def test_upgrade_builds_model_schema(database, empty_database):
+    # Пустая база после всех шагов = схема моделей: изменение модели без нового шага не пройдёт
+    assert await current_version(database) == LATEST_VERSION
+    async with database.connect() as conn:
+        migrated = await conn.run_sync(describe_schema)
+
+    await empty_database()
+    async with database.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+        expected = await conn.run_sync(describe_schema)
+    assert migrated == expected
+
+
+async def test_upgrade_is_idempotent(database):
+    assert await upgrade(database) == []
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.categories.cache import category_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_amount_out_of_range(client, categories):
+    food = categories["еда"]
+    response = await client.post(
+        "/api/operations/create/", params={"amount": "1e30", "description": "x", "category_id": food}
+    )
+    assert response.status_code == 400, response.text
+
+    # В пакете - ошибка одной строки, остальные записываются
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "1e30", "category_id": food},
+        {"amount": "10", "category_id": food},
+    ])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["created"] == 1
+    assert [error["row"] for error in body["errors"]] == [0]
+
+
+async def test_bulk_reports_bad_rows(client, categories):
+    food = categories["еда"]
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "10", "category_id": food},
+        "не объект",
+        {"amount": "20", "category_id": 999},
+        {"amount": "30", "category_id": food, "created_at": "2026-01-05"},
+    ])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["created"] == 2
+    assert [error["row"] for error in body["errors"]] == [1, 2]
+    assert body["errors"][1]["detail"] == "Категория не найдена"
+
+
+async def test_bulk_resolves_categories_in_one_query(client, categories, monkeypatch):
+    # Кэш пуст - все категории пакета одним запросом
+    category_cache.by_id.clear()
+    category_cache.by_type_name.clear()
+    queries = []
+    execute = AsyncSession.execute
+
+    async def counting_execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_select", False):
+            queries.append(statement)
+        return await execute(self, statement, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncSession, "execute", counting_execute)
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": str(number + 1), "category_id": category_id}
+        for number, category_id in enumerate([categories["еда"], categories["зарплата"]] * 5)
+    ])
+    assert response.json() == {"created": 10, "errors": []}
+    assert sum("FROM categories" in str(query) for query in queries) == 1
+
+
+async def test_description_is_optional(client, categories):
+    food = categories["еда"]
+    response = await client.post("/api/operations/create/", params={"amount": "10", "category_id": food})
+    assert response.status_code == 200, response.text
+    operation_id = response.json()["id"]
+
+    response = await client.patch(
+        f"/api/operations/{operation_id}/edit/", params={"amount": "15", "category_id": food}
+    )
+    assert response.status_code == 200, response.text
+    response = await client.get(f"/api/operations/{operation_id}/")
+    assert response.json()["description"] == ""
+    assert response.json()["amount"] == "15.00"
+
+
+async def test_keyset_pages_cover_every_row_once(client, categories):
+    # Несколько операций в один день: порядок внутри дня задаёт id
+    food = categories["еда"]
+    days = ["2026-03-01", "2026-03-02", "2026-03-02", "2026-03-02", "2026-03-05"]
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": str(number + 1), "category_id": food, "created_at": day}
+        for number, day in enumerate(days)
+    ])
+    assert response.json() == {"created": 5, "errors": []}
+
+    pages = []
+    params = {"limit": 2, "date_from": "2026-03-01", "date_to": "2026-03-31"}
+    while True:
+        response = await client.get("/api/operations/all/", params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append([(item["created_at"], item["id"]) for item in body["items"]])
+        if body["next_cursor"] is None:
+            break
+        params["after"] = body["next_cursor"]
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    keys = [key for page in pages for key in page]
+    assert keys == sorted(keys, reverse=True)
+    assert len(set(keys)) == 5
+
+    response = await client.get("/api/operations/all/", params={"after": "не курсор"})
+    assert response.status_code == 400
+
+
+async def test_export_formats(client, categories):
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "10.50", "description": "обед", "category_id": categories["еда"], "created_at": "2026-03-02"},
+        {"amount": "1000", "description": "аванс", "category_id": categories["зарплата"], "created_at": "2026-03-05"},
+    ])
+    assert response.json() == {"created": 2, "errors": []}
+    params = {"date_from": "2026-03-01", "date_to": "2026-03-31"}
+
+    response = await client.get("/api/operations/export/", params=params)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["created_at"], line["amount"], line["description"]) for line in lines] == [
+        ("2026-03-05", "1000.00", "аванс"),
+        ("2026-03-02", "10.50", "обед"),
+    ]
+
+    response = await client.get("/api/operations/export/", params={**params, "format": "csv", "type": "expense"})
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["created_at"], row["amount"], row["description"]) for row in rows] == [
+        ("2026-03-02", "10.50", "обед"),
+    ]
+
+    # Ошибка периода - до начала потока, обычным ответом
+    response = await client.get("/api/operations/export/", params={"date_from": "2026-03-31", "date_to": "2026-03-01"})
+    assert response.status_code == 400
@@ -0,0 +1,77 @@
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.database import engine, read_engine
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(engine.dialect.name != "sqlite", reason="EXPLAIN QUERY PLAN - только SQLite"),
+]
+
+
+@contextmanager
+def captured_selects():
+    # SQL, который роуты на самом деле отправляют в базу, с параметрами
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    for target in (engine, read_engine):
+        event.listen(target.sync_engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        for target in (engine, read_engine):
+            event.remove(target.sync_engine, "before_cursor_execute", capture)
+
+
+async def query_plan(statement: str, parameters) -> list[str]:
+    async with engine.connect() as conn:
+        rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in rows]
+
+
+async def plans_for(client, url: str, params: dict, table: str) -> list[list[str]]:
+    with captured_selects() as statements:
+        response = await client.get(url, params=params)
+    assert response.status_code in (200, 400), response.text
+    plans = [
+        await query_plan(statement, parameters)
+        for statement, parameters in statements
+        if re.search(rf"\bFROM {table}\b", statement)
+    ]
+    assert plans, f"{url} не обращался к {table}"
+    return plans
+
+
+@pytest.mark.parametrize(
+    ("url", "params", "table", "index"),
+    [
+        ("/api/operations/", {"type": "expense", "month": "2026-01"}, "operations", "ix_operations_wallet_created_at"),
+        ("/api/operations/all/", {"month": "2026-01"}, "operations", "ix_operations_wallet_created_at"),
+        ("/api/analytics/", {"month": "2026-01", "group_by": "week"}, "daily_category_totals", "uq_wallet_day_category_currency"),
+        ("/api/analytics/categories/", {"types": "expense", "year": 2025}, "daily_category_totals", "uq_wallet_day_category_currency"),
+    ],
+)
+async def test_period_queries_use_indexes(client, categories, url, params, table, index):
+    for day in ("2025-12-31", "2026-01-10", "2026-02-01"):
+        response = await client.post("/api/operations/bulk/", json=[
+            {"amount": "10", "category_id": category_id, "created_at": day}
+            for category_id in categories.values()
+        ])
+        assert response.json()["created"] == 2
+
+    for plan in await plans_for(client, url, params, table):
+        # Полный проход по таблице за период - та самая регрессия
+        assert not any(re.match(rf"SCAN {table}\b", line) for line in plan), plan
+        assert any(line.startswith(f"SEARCH {table}") for line in plan), plan
+        # Уникальный индекс агрегата SQLite называет sqlite_autoindex_*
+        names = " ".join(plan)
+        assert index in names or (
+            index.startswith("uq_") and f"sqlite_autoindex_{table}_1" in names
+        ), plan
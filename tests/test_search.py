@@ -0,0 +1,43 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def found(client, q: str) -> list[str]:
+    response = await client.get("/api/operations/search/", params={"q": q})
+    # Пустая первая страница отдаётся как 400, как у остальных списков
+    if response.status_code == 400:
+        return []
+    assert response.status_code == 200, response.text
+    return [item["id"] for item in response.json()["items"]]
+
+
+async def test_search_follows_updates_deletes_and_renames(client, categories):
+    food = categories["еда"]
+    response = await client.post(
+        "/api/operations/create/", params={"amount": "350", "description": "кино вечером", "category_id": food}
+    )
+    operation_id = response.json()["id"]
+    assert await found(client, "кин") == [operation_id]
+    assert await found(client, "еда") == [operation_id]
+
+    response = await client.patch(
+        f"/api/operations/{operation_id}/edit/",
+        params={"amount": "350", "description": "театр", "category_id": food},
+    )
+    assert response.status_code == 200, response.text
+    assert await found(client, "кино") == []
+    assert await found(client, "театр") == [operation_id]
+
+    # Имя категории живёт в индексе операции: переименование обновляет и его
+    response = await client.patch(
+        f"/api/categories/{food}/edit/", params={"name": "досуг", "category_type": "expense"}
+    )
+    assert response.status_code == 200, response.text
+    assert await found(client, "еда") == []
+    assert await found(client, "досуг театр") == [operation_id]
+
+    response = await client.delete(f"/api/operations/{operation_id}/delete/")
+    assert response.status_code == 200, response.text
+    assert await found(client, "театр") == []
+    assert await found(client, "досуг") == []
@@ -0,0 +1,75 @@
+import os
+from datetime import date
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.analytics import snapshots
+from app.analytics.rollup import apply_delta
+from app.config import settings
+from app.database import DEFAULT_WALLET_ID, new_session
+
+pytestmark = pytest.mark.anyio
+
+DECEMBER = date(2025, 12, 1)
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    # Настройки заморожены: каталог снимков подменяется на время теста
+    object.__setattr__(settings, "snapshot_dir", str(tmp_path))
+    yield tmp_path
+    object.__setattr__(settings, "snapshot_dir", None)
+    snapshots.frames.clear()
+
+
+async def test_backdated_write_drops_snapshot_after_commit(client, categories, snapshot_dir):
+    food = categories["еда"]
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "100", "category_id": food, "created_at": "2025-12-20"},
+    ])
+    assert response.json() == {"created": 1, "errors": []}
+    assert await snapshots.export(DEFAULT_WALLET_ID)
+    path = snapshots.snapshot_path(DEFAULT_WALLET_ID, DECEMBER)
+    assert await snapshots.load(DEFAULT_WALLET_ID, DECEMBER) is not None
+
+    # Откат: снимок по-прежнему верен
+    async with new_session() as session:
+        await apply_delta(session, DEFAULT_WALLET_ID, date(2025, 12, 5), food, "RUB", 500, 1)
+        await session.rollback()
+    assert os.path.exists(path)
+
+    # До коммита снимок на месте, после - удалён
+    async with new_session() as session:
+        await apply_delta(session, DEFAULT_WALLET_ID, date(2025, 12, 5), food, "RUB", 500, 1)
+        assert os.path.exists(path)
+        await session.commit()
+    assert not os.path.exists(path)
+    assert await snapshots.load(DEFAULT_WALLET_ID, DECEMBER) is None
+
+
+async def test_export_discards_month_changed_during_export(client, categories, snapshot_dir, monkeypatch):
+    food = categories["еда"]
+    response = await client.post("/api/operations/bulk/", json=[
+        {"amount": "100", "category_id": food, "created_at": "2025-12-20"},
+    ])
+    assert response.json() == {"created": 1, "errors": []}
+
+    # Запись задним числом коммитится после того, как выгрузка запомнила агрегат месяца
+    month_rollup = snapshots.month_rollup
+    calls = []
+
+    async def rollup_then_write(wallet_id, month):
+        rollup = await month_rollup(wallet_id, month)
+        if not calls:
+            async with new_session() as session:
+                await apply_delta(session, wallet_id, date(2025, 12, 5), food, "RUB", 500, 1)
+                await session.commit()
+        calls.append(month)
+        return rollup
+
+    monkeypatch.setattr(snapshots, "month_rollup", rollup_then_write)
+    assert await snapshots.export_month(DEFAULT_WALLET_ID, DECEMBER) is None
+    assert not os.path.exists(snapshots.snapshot_path(DEFAULT_WALLET_ID, DECEMBER))
+    assert await snapshots.export_month(DEFAULT_WALLET_ID, DECEMBER) == 1
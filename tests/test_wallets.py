@@ -0,0 +1,73 @@
+import pytest
+
+from app import database
+from app.config import settings
+from app.migrations.__main__ import create
+from tests.conftest import reset_caches
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_category(client, wallet_id: int, name: str) -> int:
+    response = await client.post(
+        "/api/categories/create/",
+        params={"name": name, "category_type": "expense"},
+        headers={"X-Wallet-Id": str(wallet_id)},
+    )
+    assert response.status_code == 200, response.text
+    return int(response.json()["id"])
+
+
+async def test_wallets_do_not_see_each_other(client, categories):
+    food = categories["еда"]
+    response = await client.post(
+        "/api/operations/create/", params={"amount": "10", "description": "обед", "category_id": food}
+    )
+    operation_id = response.json()["id"]
+    other = {"X-Wallet-Id": "2"}
+    await create_category(client, 2, "такси")
+
+    response = await client.get("/api/categories/all/", headers=other)
+    assert [category["name"] for category in response.json()] == ["такси"]
+    # Чужая операция не видна, чужая категория не принимается
+    response = await client.get(f"/api/operations/{operation_id}/", headers=other)
+    assert response.status_code == 400
+    response = await client.post(
+        "/api/operations/create/", params={"amount": "10", "category_id": food}, headers=other
+    )
+    assert response.status_code == 400
+    response = await client.get("/api/analytics/balance/", headers=other)
+    assert response.json()["balance"] == "0.00"
+
+
+@pytest.fixture
+async def tenants(client, tmp_path):
+    # Настройки заморожены: режим файлов на кошелёк включается на время теста,
+    # открытым держится один кошелёк
+    saved = settings.tenant_database_dir, settings.tenant_engines_max
+    object.__setattr__(settings, "tenant_database_dir", str(tmp_path))
+    object.__setattr__(settings, "tenant_engines_max", 1)
+    reset_caches()
+    for wallet_id in (1, 2):
+        assert await create(wallet_id) == 0
+    yield client
+    await database.dispose_tenants()
+    object.__setattr__(settings, "tenant_database_dir", saved[0])
+    object.__setattr__(settings, "tenant_engines_max", saved[1])
+    reset_caches()
+
+
+async def test_tenant_files(tenants):
+    client = tenants
+    response = await client.get("/api/categories/all/", headers={"X-Wallet-Id": "3"})
+    assert response.status_code == 404
+
+    # id категорий в разных файлах совпадают, данные - нет
+    assert await create_category(client, 1, "еда") == await create_category(client, 2, "такси")
+    assert list(database.tenant_sessions) == [2]
+
+    # Открытие второго кошелька закрыло первый; обращение к нему открывает его снова
+    response = await client.get("/api/categories/all/", headers={"X-Wallet-Id": "1"})
+    assert [category["name"] for category in response.json()] == ["еда"]
+    assert list(database.tenant_sessions) == [1]
+    assert list(database.tenant_engines) == [1]
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app.analytics.rollup import verify
+from app.database import DEFAULT_WALLET_ID, Operation, new_read_session
+from app.operations.writer import WriteBehindQueue
+
+pytestmark = pytest.mark.anyio
+
+
+def operation(category_id: int, amount_minor: int) -> dict:
+    return {
+        "wallet_id": DEFAULT_WALLET_ID, "amount_minor": amount_minor, "currency": "RUB",
+        "created_at": date(2026, 3, 2), "description": "", "category_id": category_id,
+    }
+
+
+async def operations_count() -> int:
+    async with new_read_session() as session:
+        return await session.scalar(select(func.count()).select_from(Operation))
+
+
+async def test_stop_flushes_queue(client, categories):
+    # Задержка пачки больше времени теста: строки пишет только остановка
+    writer = WriteBehindQueue(max_delay_ms=60_000, max_rows=1000)
+    await writer.start()
+    submitted = [
+        asyncio.create_task(writer.submit(operation(categories["еда"], 100 * (number + 1))))
+        for number in range(3)
+    ]
+    await asyncio.sleep(0.05)
+    assert await operations_count() == 0
+
+    await writer.stop()
+    ids = await asyncio.gather(*submitted)
+    assert len(set(ids)) == 3
+    assert await operations_count() == 3
+    assert await verify(DEFAULT_WALLET_ID) == []
+
+
+async def test_bad_row_fails_alone(client, categories):
+    writer = WriteBehindQueue(max_delay_ms=60_000, max_rows=3)
+    await writer.start()
+    good = operation(categories["еда"], 100)
+    results = await asyncio.gather(
+        writer.submit(good),
+        writer.submit(operation(999, 200)),
+        writer.submit(good),
+        return_exceptions=True,
+    )
+    await writer.stop()
+
+    assert isinstance(results[1], HTTPException) and results[1].status_code == 400
+    assert all(isinstance(result, int) for result in (results[0], results[2]))
+    assert await operations_count() == 2
+    assert await verify(DEFAULT_WALLET_ID) == []